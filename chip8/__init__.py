@@ -0,0 +1,8 @@
+# the headless core. Everything else (the Tk frontend, jit, idle, audio, movie, server, vector,
+# ...) is a module of its own that is only imported when it's used, so `import chip8` stays cheap
+# and doesn't need Tkinter, NumPy or a display.
+from .emu import Emulator, IllegalInstruction, RomError, Profile, PROFILES, CHIP8, VIP, SCHIP
+from .scheduler import Scheduler
+
+__all__ = ["Emulator", "IllegalInstruction", "RomError", "Profile", "PROFILES", "CHIP8", "VIP", "SCHIP",
+           "Scheduler"]
@@ -0,0 +1,130 @@
+import math
+import struct
+import threading
+import wave
+from queue import SimpleQueue, Empty
+
+from .scheduler import TIMER_HZ
+
+SAMPLE_RATE = 44100
+# a multiple of TIMER_HZ, so every tick's worth of beep is a whole number of periods and the
+# same pre-rendered buffer can be played back to back without clicks
+TONE_HZ = 480
+VOLUME = 0.2
+# a live sink that's more than this many ticks behind drops the oldest ones, so the beep doesn't
+# lag further and further behind the game when the emulator runs faster than real time
+MAX_LATENCY = 4
+
+
+def render(rate=SAMPLE_RATE, tone=TONE_HZ, volume=VOLUME):
+    # returns (beep, silence), one timer tick of 16-bit mono samples each. The beep is a square
+    # wave, like the buzzer of the original machines.
+    samples = rate // TIMER_HZ
+    level = int(volume * 32767)
+    beep = [level if math.sin(2 * math.pi * tone * n / rate) >= 0 else -level for n in range(samples)]
+    return struct.pack("<%dh" % samples, *beep), bytes(2 * samples)
+
+
+class NullSink:
+    # throws everything away
+    realtime = False
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+class WavSink:
+    # writes the sound to a mono 16-bit WAV file, e.g. to capture the sound of a headless run
+    realtime = False
+
+    def __init__(self, path, rate=SAMPLE_RATE):
+        # opened here rather than by wave.open(path), which leaves a half made writer behind
+        # that fails again when it's collected if the file can't be created
+        self.raw = open(path, "wb")
+        self.file = wave.open(self.raw, "wb")
+        self.file.setnchannels(1)
+        self.file.setsampwidth(2)
+        self.file.setframerate(rate)
+
+    def write(self, data):
+        self.file.writeframesraw(data)
+
+    def close(self):
+        # wave doesn't close a file it didn't open itself
+        self.file.close()
+        self.raw.close()
+
+
+class DeviceSink:
+    # plays the sound on the default output device, needs the sounddevice package
+    realtime = True
+
+    def __init__(self, rate=SAMPLE_RATE):
+        try:
+            import sounddevice
+        except ImportError:
+            raise ImportError("DeviceSink needs the sounddevice package (pip install sounddevice)") from None
+        self.stream = sounddevice.RawOutputStream(samplerate=rate, channels=1, dtype="int16")
+        self.stream.start()
+
+    def write(self, data):
+        # blocks until the device has room, which is fine, it's only ever called by Audio's thread
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class Audio:
+    # turns the sound timer into sound. Every timer tick the emulator calls tick() with whether
+    # the sound timer was running, which only queues a flag. A thread of its own turns the flags
+    # into the pre-rendered beep and silence buffers and writes them to the sink, so the beep
+    # starts and stops exactly on ticks and the CPU never waits for the sink.
+    # usage: audio = Audio(WavSink("run.wav")).attach(emulator) ... audio.close()
+    def __init__(self, sink, rate=SAMPLE_RATE, tone=TONE_HZ, volume=VOLUME):
+        self.sink = sink
+        self.beep, self.silence = render(rate, tone, volume)
+        self.queue = SimpleQueue()
+        self.emulator = None
+        self.thread = threading.Thread(target=self.run, name="chip8-audio", daemon=True)
+        self.thread.start()
+
+    def attach(self, emulator):
+        emulator.audio = self
+        self.emulator = emulator
+        return self
+
+    def tick(self, sounding):
+        self.queue.put(sounding)
+
+    def run(self):
+        queue = self.queue
+        while True:
+            ticks = [queue.get()]
+            # writes whatever has piled up in one go
+            try:
+                while len(ticks) < TIMER_HZ:
+                    ticks.append(queue.get_nowait())
+            except Empty:
+                pass
+            done = None in ticks
+            if done:
+                ticks = ticks[:ticks.index(None)]
+            if self.sink.realtime and len(ticks) > MAX_LATENCY:
+                ticks = ticks[-MAX_LATENCY:]
+            if ticks:
+                self.sink.write(b"".join(self.beep if sounding else self.silence for sounding in ticks))
+            if done:
+                return
+
+    def close(self):
+        # writes out the ticks that are still queued and closes the sink
+        if self.emulator is not None and self.emulator.audio is self:
+            self.emulator.audio = None
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from .emu import Emulator, IllegalInstruction, PROFILES, pack_display
+from .scheduler import Scheduler
+
+
+# a task is a dict like this one, only "rom" is required:
+#   {"rom": "roms/PONG", "cycles": 100000, "seed": 1, "cpu_hz": 600, "jit": false, "idle": false,
+#    "profile": "chip8", "inputs": [[frame, key, down], ...]}
+# "inputs" is the input script, e.g. [30, 5, true] presses key 5 right before frame 30 runs.
+DEFAULT_CYCLES = 100000
+# frames between two checkpoints of a task's state, a fault is looked for again from the last one
+CHECKPOINT_FRAMES = 600
+
+
+def run_task(task):
+    # runs one ROM headless and unthrottled, returns a dict with the final state
+    cycles = task.get("cycles", DEFAULT_CYCLES)
+    start = perf_counter()
+    try:
+        emulator = Emulator(task["rom"], jit=task.get("jit", False), seed=task.get("seed"),
+                            idle=task.get("idle", False), profile=task.get("profile", "chip8"))
+    except (OSError, ValueError) as e:
+        # a ROM that's missing, too big or asks for an unknown profile is that task's result,
+        # the rest of the batch goes on
+        return {
+            "rom": task["rom"],
+            "seed": task.get("seed"),
+            "cycles": 0,
+            "frames": 0,
+            "pc": None,
+            "index": None,
+            "v": None,
+            "stack": None,
+            "delay_timer": None,
+            "sound_timer": None,
+            "framebuffer": None,
+            "wall_time": perf_counter() - start,
+            "error": str(e),
+        }
+    scheduler = Scheduler(emulator, cpu_hz=task.get("cpu_hz", 600), throttle=False)
+    # frame -> [(key, down)], inputs for frames before 0 are pressed before the first one
+    events = {}
+    for frame, key, down in sorted(task.get("inputs", ())):
+        events.setdefault(max(0, frame), []).append((key, down))
+    last_input = max(events) if events else -1
+    # (frame, save_state()) from the start of a recent frame, see count_to_fault()
+    checkpoint = None
+    executed = 0
+    error = None
+    try:
+        while executed < cycles:
+            frame = scheduler.frames
+            if frame % CHECKPOINT_FRAMES == 0:
+                checkpoint = (frame, emulator.save_state())
+            press(emulator, events.get(frame, ()))
+            if emulator.waiting_key is not None:
+                # blocked on Fx0A: the frame goes by without running anything, and if no key
+                # is ever coming the ROM is done
+                if frame >= last_input:
+                    break
+                scheduler.frame()
+            elif cycles - executed >= scheduler.cycles_per_frame:
+                scheduler.frame()
+                executed += scheduler.cycles_per_frame
+            else:
+                # what's left of the budget doesn't make up a whole frame, so no timer tick
+                emulator.run(cycles - executed)
+                executed = cycles
+    except (IllegalInstruction, IndexError) as e:
+        error = str(e)
+        executed += count_to_fault(emulator, scheduler, checkpoint, events)
+    return {
+        "rom": task["rom"],
+        "seed": task.get("seed"),
+        "cycles": executed,
+        "frames": scheduler.frames,
+        "pc": emulator.pc,
+        "index": emulator.index,
+        "v": list(emulator.gpio),
+        "stack": list(emulator.stack),
+        "delay_timer": emulator.delay_timer,
+        "sound_timer": emulator.sound_timer,
+        "framebuffer": framebuffer_hash(emulator),
+        "wall_time": perf_counter() - start,
+        "error": error,
+    }
+
+
+def press(emulator, events):
+    for key, down in events:
+        if down:
+            emulator.key_down(key)
+        else:
+            emulator.key_up(key)
+
+
+def count_to_fault(emulator, scheduler, checkpoint, events):
+    # the frame that faulted is run again from the checkpoint, an instruction at a time, to
+    # find out how many of its instructions ran before the fault. Counting them as they run
+    # would slow every frame down, this only costs something for the tasks that fault.
+    fault = scheduler.frames
+    frame, state = checkpoint
+    emulator.load_state(state)
+    scheduler.frames = frame
+    while scheduler.frames < fault:
+        press(emulator, events.get(scheduler.frames, ()))
+        scheduler.frame()
+    press(emulator, events.get(fault, ()))
+    executed = 0
+    try:
+        while executed < scheduler.cycles_per_frame:
+            emulator.step()
+            executed += 1
+    except (IllegalInstruction, IndexError):
+        pass
+    return executed
+
+
+def framebuffer_hash(emulator):
+    return hashlib.sha1(pack_display(emulator.display)).hexdigest()
+
+
+def run_batch(tasks, workers=None, chunksize=None):
+    # fans the tasks out over a process pool, one headless emulator per task, and yields the
+    # results in the same order as the tasks as soon as they come back. Tasks are handed to
+    # the workers chunksize at a time so that lots of short runs don't spend all their time
+    # in IPC, by default every worker gets about 4 chunks.
+    tasks = list(tasks)
+    if not tasks:
+        return
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(run_task, tasks, chunksize=chunksize):
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many CHIP-8 ROMs headless in parallel.")
+    parser.add_argument("roms", nargs="*", help="ROM files, each one becomes a task")
+    parser.add_argument("--manifest", help="JSON file with a list of tasks (see batch.py)")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES, help="instructions per ROM")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[None],
+                        help="run every ROM once per seed")
+    parser.add_argument("--cpu-hz", type=int, default=600)
+    parser.add_argument("--jit", action="store_true", help="use the translation cache")
+    parser.add_argument("--idle", action="store_true", help="skip wait loops (see idle.py)")
+    parser.add_argument("--profile", default="chip8", choices=sorted(PROFILES), help="machine profile")
+    parser.add_argument("--workers", type=int, help="number of processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, help="tasks sent to a worker at once")
+    parser.add_argument("--out", help="write the results (JSON lines) here instead of stdout")
+    args = parser.parse_args(argv)
+
+    tasks = []
+    if args.manifest:
+        with open(args.manifest) as file:
+            tasks.extend(json.load(file))
+    for rom in args.roms:
+        for seed in args.seeds:
+            tasks.append({"rom": rom, "cycles": args.cycles, "seed": seed,
+                          "cpu_hz": args.cpu_hz, "jit": args.jit, "idle": args.idle,
+                          "profile": args.profile})
+    if not tasks:
+        parser.error("no ROMs given")
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        for result in run_batch(tasks, workers=args.workers, chunksize=args.chunksize):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
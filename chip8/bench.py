@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+from .emu import Emulator
+from .rewind import RewindBuffer
+from .scheduler import Scheduler
+
+
+def assemble(*opcodes):
+    return b"".join(opcode.to_bytes(2, "big") for opcode in opcodes)
+
+
+# generated ROMs, each one spends (almost) all of its time in one family of instructions.
+# All of them are endless loops starting at 0x200.
+MICRO_ROMS = {
+    # 8xyN arithmetic
+    "alu": assemble(
+        0x6005, 0x6103,                          # 200: V0 = 5, V1 = 3
+        0x8014, 0x8105, 0x8213, 0x8321,          # 204: add, sub, xor, or
+        0x8232, 0x8416, 0x851E, 0x8637,          # 20C: and, shr, shl, subn
+        0x7001, 0x1204,                          # 214: V0 += 1, jump 204
+    ),
+    # 3xkk / 4xkk / 5xy0 / 9xy0, half of them taken
+    "skip": assemble(
+        0x6000, 0x6101,                          # 200: V0 = 0, V1 = 1
+        0x3000, 0x6200, 0x4000, 0x6200,          # 204: skip if V0 == 0, skip if V0 != 0
+        0x5010, 0x6200, 0x9010, 0x6200,          # 20C: skip if V0 == V1, skip if V0 != V1
+        0x3101, 0x6200, 0x4101, 0x6200,          # 214
+        0x1204,                                  # 21C: jump 204
+    ),
+    # Dxyn sprites all over the screen
+    "draw": assemble(
+        0x6000, 0x6100, 0xA200,                  # 200: V0 = V1 = 0, I = 200
+        0xD01F, 0x7007, 0x7103, 0x1206,          # 206: draw 15 rows, move, jump 206
+    ),
+    # Fx55 / Fx65 copying all registers back and forth
+    "memory": assemble(
+        0xA300,                                  # 200: I = 300
+        0xFF55, 0xFF65, 0x7001, 0xFF55,          # 202: store, load, V0 += 1, store
+        0xFF65, 0x1202,                          # 20A: load, jump 202
+    ),
+    # 2nnn / 00EE
+    "call": assemble(
+        0x220A, 0x220C, 0x220A, 0x220C,          # 200: call 20A, call 20C ...
+        0x1200,                                  # 208: jump 200
+        0x00EE,                                  # 20A: return
+        0x7001, 0x00EE,                          # 20C: V0 += 1, return
+    ),
+    # Fx07 / 3xkk / 1nnn waiting for the delay timer, what games do between frames
+    "wait": assemble(
+        0x6005, 0xF015,                          # 200: DT = 5
+        0xF107, 0x3100, 0x1204,                  # 204: V1 = DT, until V1 == 0
+        0x7201, 0x1200,                          # 20A: V2 += 1, jump 200
+    ),
+}
+
+# whole games, run from files when they're around (e.g. the INVADERS this emulator
+# started with), with a scripted input that keeps the game moving
+GAME_SCRIPT = [(frame, key, (frame // 20) % 2 == 0) for frame in range(0, 100000, 20) for key in (4, 5, 6)]
+
+DEFAULT_FRAMES = 2000
+
+# how much longer than a bare `python -c pass` a headless `python -m chip8` may take to start up,
+# run one frame and exit. Going over it fails the run, same as a regression against the baseline.
+STARTUP_BUDGET = 0.05
+STARTUP_RUNS = 5
+# modules that must not be imported on the way to running a ROM headless
+HEAVY_MODULES = ("tkinter", "numpy", "asyncio", "concurrent.futures", "sounddevice")
+
+
+def run_bench(rom, frames, cpu_hz=600, jit=False, script=(), idle=False, rewind=False):
+    # runs the ROM unthrottled for the given number of frames, returns the timings. rewind
+    # records every frame into a RewindBuffer, which should cost next to nothing.
+    emulator = Emulator(jit=jit, seed=0, idle=idle)
+    emulator.load_rom_bytes(rom)
+    scheduler = Scheduler(emulator, cpu_hz=cpu_hz, throttle=False)
+    if rewind:
+        RewindBuffer(emulator).attach(scheduler)
+    events = {}
+    for frame, key, down in script:
+        events.setdefault(frame, []).append((key, down))
+    start = perf_counter()
+    for frame in range(frames):
+        for key, down in events.get(frame, ()):
+            if down:
+                emulator.key_down(key)
+            else:
+                emulator.key_up(key)
+        scheduler.frame()
+    elapsed = perf_counter() - start
+    return {
+        "instructions_per_second": frames * scheduler.cycles_per_frame / elapsed,
+        "frames_per_second": frames / elapsed,
+        "seconds": elapsed,
+    }
+
+
+def peak_memory(rom, frames, cpu_hz=600, jit=False, script=(), idle=False, rewind=False):
+    # peak Python memory of a (shorter) run, measured separately because tracemalloc
+    # slows everything down a lot
+    tracemalloc.start()
+    try:
+        run_bench(rom, frames, cpu_hz, jit, script, idle, rewind)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def cold_start(runs=STARTUP_RUNS):
+    # wall time of fresh interpreters, the best of a few runs each: a bare one, and one running a
+    # micro ROM headless for a frame through the command line entry point. Also lists the heavy
+    # modules the command line has imported by the time it would start running.
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.NamedTemporaryFile(suffix=".ch8", delete=False) as file:
+        file.write(MICRO_ROMS["alu"])
+    try:
+        def best(command):
+            times = []
+            for _ in range(runs):
+                start = perf_counter()
+                subprocess.run(command, cwd=root, check=True, stdout=subprocess.DEVNULL)
+                times.append(perf_counter() - start)
+            return min(times)
+        python = best([sys.executable, "-c", "pass"])
+        chip8 = best([sys.executable, "-m", "chip8", file.name, "--headless", "--frames", "1", "--no-throttle"])
+        check = "import sys, chip8.cli; print(' '.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+        heavy = subprocess.run([sys.executable, "-c", check], cwd=root, check=True,
+                               stdout=subprocess.PIPE, text=True).stdout.split()
+    finally:
+        os.unlink(file.name)
+    return {
+        "python_seconds": python,
+        "chip8_seconds": chip8,
+        "overhead_seconds": chip8 - python,
+        "heavy_modules": heavy,
+    }
+
+
+def run_suite(frames=DEFAULT_FRAMES, games=(), cpu_hz=600, modes=("interpreter", "jit", "idle", "rewind")):
+    benches = dict((name, (rom, ())) for name, rom in MICRO_ROMS.items())
+    for path in games:
+        with open(path, "rb") as file:
+            benches[os.path.basename(path)] = (file.read(), GAME_SCRIPT)
+    results = {}
+    for name, (rom, script) in benches.items():
+        for mode in modes:
+            jit = mode == "jit"
+            idle = mode == "idle"
+            rewind = mode == "rewind"
+            result = run_bench(rom, frames, cpu_hz, jit, script, idle, rewind)
+            result["peak_memory_bytes"] = peak_memory(rom, max(1, frames // 10), cpu_hz, jit, script, idle, rewind)
+            results["%s/%s" % (name, mode)] = result
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "frames": frames,
+        "cpu_hz": cpu_hz,
+        "results": results,
+        "startup": cold_start(),
+    }
+
+
+def compare(report, baseline, tolerance):
+    # returns a list of (name, baseline, current) for every bench that got slower than
+    # the baseline by more than tolerance (0.1 = 10%)
+    regressions = []
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        before = old["instructions_per_second"]
+        after = result["instructions_per_second"]
+        if after < before * (1 - tolerance):
+            regressions.append((name, before, after))
+    return regressions
+
+
+def check_startup(startup, budget=STARTUP_BUDGET):
+    # returns a list of problems with the cold start, empty if it's fine
+    problems = []
+    if startup["overhead_seconds"] > budget:
+        problems.append("startup takes %.0f ms on top of the interpreter, the budget is %.0f ms"
+                        % (startup["overhead_seconds"] * 1000, budget * 1000))
+    if startup["heavy_modules"]:
+        problems.append("starting headless imports %s" % ", ".join(startup["heavy_modules"]))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CHIP-8 emulator benchmarks.")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="frames per bench")
+    parser.add_argument("--cpu-hz", type=int, default=600)
+    parser.add_argument("--rom", action="append", default=[],
+                        help="whole game to benchmark as well (can be repeated)")
+    parser.add_argument("--no-jit", action="store_true", help="only benchmark the interpreter")
+    parser.add_argument("--out", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline (default 0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    modes = ("interpreter", "idle", "rewind") if args.no_jit else ("interpreter", "jit", "idle", "rewind")
+    report = run_suite(args.frames, args.rom, args.cpu_hz, modes)
+    for name, result in report["results"].items():
+        print("%-24s %10.0f instr/s %9.0f frames/s %8.0f KiB" % (
+            name, result["instructions_per_second"], result["frames_per_second"],
+            result["peak_memory_bytes"] / 1024))
+    startup = report["startup"]
+    print("%-24s %10.0f ms (python alone %.0f ms)" % (
+        "startup", startup["chip8_seconds"] * 1000, startup["python_seconds"] * 1000))
+    problems = check_startup(startup)
+    for problem in problems:
+        print("STARTUP %s" % problem)
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for name, before, after in regressions:
+            print("REGRESSION %s: %.0f -> %.0f instr/s" % (name, before, after))
+        if regressions:
+            sys.exit(1)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
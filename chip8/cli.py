@@ -0,0 +1,108 @@
+import argparse
+import sys
+
+from .emu import Emulator, IllegalInstruction, PROFILES, RomError
+from .scheduler import Scheduler
+
+
+def open_trace(path):
+    # JSON lines for .json/.jsonl, the compact binary format for anything else
+    from .tracing import BinaryTrace, JsonTrace
+    if path.endswith((".json", ".jsonl")):
+        return JsonTrace(path)
+    return BinaryTrace(path)
+
+
+def open_sound(parser, sink):
+    # --sound device or --sound wav:PATH
+    from .audio import DeviceSink, WavSink
+    if sink == "device":
+        # sounddevice raises OSError when it's installed but PortAudio isn't
+        try:
+            return DeviceSink()
+        except (ImportError, OSError) as e:
+            sys.exit("chip8: %s" % e)
+    if sink.startswith("wav:") and len(sink) > 4:
+        return WavSink(sink[4:])
+    parser.error("--sound takes 'device' or 'wav:PATH'")
+
+
+def run_window(emulator, args, sound):
+    # the frontend closes sound with the window
+    try:
+        from tkinter import TclError
+        from .frontend import TkFrontend
+    except ImportError:
+        if sound is not None:
+            sound.close()
+        sys.exit("chip8: Tkinter isn't available, use --headless")
+    try:
+        frontend = TkFrontend(emulator, size=args.scale, cpu_hz=args.cpu_hz, sound=sound)
+    except TclError as e:
+        if sound is not None:
+            sound.close()
+        sys.exit("chip8: can't open a window (%s), use --headless" % e)
+    frontend.run()
+
+
+def run_headless(emulator, args, sound):
+    # sound is closed at the end of the run
+    scheduler = Scheduler(emulator, cpu_hz=args.cpu_hz, throttle=not args.no_throttle)
+    audio = None
+    if sound is not None:
+        from .audio import Audio
+        audio = Audio(sound).attach(emulator)
+    try:
+        scheduler.run(args.frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if audio is not None:
+            audio.close()
+    print("%d frames, pc %03X, I %03X, V %s" % (scheduler.frames, emulator.pc, emulator.index,
+                                                 " ".join("%02X" % v for v in emulator.gpio)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="chip8", description="Run a CHIP-8 ROM.")
+    parser.add_argument("rom", help="ROM file")
+    parser.add_argument("--scale", type=int, default=8, help="screen pixels per CHIP-8 pixel (default 8)")
+    parser.add_argument("--speed", "--cpu-hz", dest="cpu_hz", type=int, default=600,
+                        help="instructions per second (default 600)")
+    parser.add_argument("--headless", action="store_true", help="run without a window")
+    parser.add_argument("--frames", type=int, help="stop after this many 60 Hz frames (headless only)")
+    parser.add_argument("--no-throttle", action="store_true",
+                        help="run as fast as possible instead of in real time (headless only)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write every executed instruction to PATH, as JSON lines if it ends in .json/.jsonl")
+    parser.add_argument("--sound", metavar="SINK",
+                        help="play the beeper: 'device' (needs sounddevice) or 'wav:PATH' to write it to a file")
+    parser.add_argument("--profile", default="chip8", choices=sorted(PROFILES), help="machine profile")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--jit", action="store_true", help="use the translation cache")
+    parser.add_argument("--idle", action="store_true", help="skip wait loops")
+    args = parser.parse_args(argv)
+
+    try:
+        emulator = Emulator(args.rom, jit=args.jit, seed=args.seed, idle=args.idle, profile=args.profile)
+    except (OSError, RomError) as e:
+        sys.exit("chip8: %s" % e)
+    trace = None
+    try:
+        if args.trace:
+            trace = emulator.trace = open_trace(args.trace)
+        # opened last, right before the run that takes care of closing it
+        sound = open_sound(parser, args.sound) if args.sound else None
+        if args.headless:
+            run_headless(emulator, args, sound)
+        else:
+            run_window(emulator, args, sound)
+    except (OSError, IllegalInstruction, IndexError) as e:
+        sys.exit("chip8: %s" % e)
+    finally:
+        if trace is not None:
+            trace.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,809 @@
+from random import Random
+import mmap
+import os
+import struct
+
+MEMORY_SIZE = 4096
+# programs are loaded at 0x200, everything below that belongs to the interpreter (fonts)
+PROGRAM_START = 0x200
+MAX_ROM_SIZE = MEMORY_SIZE - PROGRAM_START
+# subroutine levels, like the original interpreters. One more 2nnn is a stack overflow.
+STACK_DEPTH = 16
+# save_state() layout: this header, then V0 - VF (16 bytes), the SCHIP flag registers (8 bytes),
+# memory (4096 bytes), the framebuffer (32 rows of 8 bytes, or 64 rows of 16 bytes in hi-res),
+# the RNG state (625 words) and finally the stack (depth entries of 2 bytes)
+STATE_MAGIC = b"C8ST"
+STATE_VERSION = 3
+STATE_HEADER = struct.Struct("<4sBHHHBBHB?B?dHB?")
+# waiting_key value saved when the CPU isn't blocked on Fx0A
+NOT_WAITING = 0xff
+DISPLAY_STATE = struct.Struct(">32Q")
+# a hi-res row is 128 bits, it's packed as two 64-bit halves
+HIRES_DISPLAY_STATE = struct.Struct(">128Q")
+RNG_STATE = struct.Struct("<625I")
+# all 64 pixels of a framebuffer row lit
+ROW_MASK = 0xffffffffffffffff
+# where the SCHIP 8x10 font goes, right after the small one
+BIG_FONT_START = 80
+
+
+class Profile:
+    # the machine being emulated: which instructions there are, and how the instructions that
+    # interpreters never agreed on behave.
+    #   schip                 SUPER-CHIP: 128x64 hi-res mode, scrolling, 16x16 sprites, the big
+    #                         font and the flag registers (00Cn, 00FB-00FF, Dxy0, Fx30, Fx75, Fx85)
+    #   shift_vy              8xy6/8xyE shift Vy and store the result in Vx (COSMAC VIP),
+    #                         otherwise Vx is shifted in place
+    #   load_store_increment  Fx55/Fx65 leave I pointing right after the last register (COSMAC VIP)
+    #   clip_sprites          sprites are cut off at the edges of the screen instead of wrapping around
+    def __init__(self, name, schip=False, shift_vy=False, load_store_increment=False, clip_sprites=False):
+        self.name = name
+        self.schip = schip
+        self.shift_vy = shift_vy
+        self.load_store_increment = load_store_increment
+        self.clip_sprites = clip_sprites
+
+    def code(self):
+        # the profile as one byte, it's saved with the state
+        return (self.schip | self.shift_vy << 1 | self.load_store_increment << 2
+                | self.clip_sprites << 3)
+
+    def __repr__(self):
+        return "Profile(%r)" % self.name
+
+
+# what this emulator always did, and what most CHIP-8 games written in the last 30 years expect
+CHIP8 = Profile("chip8")
+VIP = Profile("vip", shift_vy=True, load_store_increment=True)
+SCHIP = Profile("schip", schip=True, clip_sprites=True)
+PROFILES = {"chip8": CHIP8, "vip": VIP, "schip": SCHIP}
+
+class Emulator:
+    # the headless core of the emulator: memory, registers, stack, timers and framebuffer.
+    # it doesn't know anything about Tkinter, so it can be driven from tests or batch jobs
+    # by calling step()/run(), or paced in 60 Hz frames by a Scheduler (see scheduler.py).
+    # A frontend (see frontend.py) can be attached on top to show the framebuffer and feed the keys.
+    # profile is a Profile or the name of one in PROFILES.
+    def __init__(self, rom_path=None, jit=False, seed=None, idle=False, profile=CHIP8):
+        if not isinstance(profile, Profile):
+            if profile not in PROFILES:
+                raise ValueError("unknown machine profile %r, known ones are %s" % (profile, ", ".join(PROFILES)))
+            profile = PROFILES[profile]
+        self.profile = profile
+
+        # hardware
+        self.memory = bytearray(MEMORY_SIZE)
+        self.gpio = [0] * 16
+        self.index = 0
+        self.pc = 512
+        self.opcode = 0
+        self.delay_timer = 0
+        self.sound_timer = 0
+        self.stack = []
+        # random number generator used by Cxkk, every emulator has its own so a run can be
+        # repeated by passing the same seed
+        self.rng = Random(seed)
+        # (version, RNG_STATE packed words, gauss) of rng as save_state() saw it last time. Packing
+        # the 624 words is most of what save_state() costs and only Cxkk changes them, so it's kept
+        # until the next Cxkk. Anything else touching rng has to set this back to None.
+        self.packed_rng = None
+        # framebuffer, 32 rows of 64 pixels (64 rows of 128 in SCHIP hi-res). Each row is a single
+        # int, the leftmost pixel is the highest bit (bit 63 or 127) and a set bit means the pixel is lit.
+        self.width = 64
+        self.height = 32
+        self.row_mask = ROW_MASK
+        self.display = [0] * 32
+        # SCHIP flag registers, Fx75/Fx85 copy V0 - V7 to and from them
+        self.flags = [0] * 8
+        # set whenever the framebuffer changes, a frontend clears it after it has shown the frame
+        self.draw_flag = False
+        # currently pressed buttons as a 16-bit mask, bit n is set while key n (0x0 - 0xF) is down.
+        # it's set by key_down()/key_up() which are called by whatever frontend is attached.
+        self.keys = 0
+        # register Fx0A is waiting to put a key into, None when the CPU isn't blocked on it
+        self.waiting_key = None
+        # optional trace hook, called as trace(emulator, pc, opcode) before every instruction
+        # is executed (see tracing.py). None means tracing is off and costs nothing.
+        self.trace = None
+        # opcode -> function running that instruction, see decode() and specialize()
+        self.decoded = decode_table(profile)
+        # optional translation cache (see jit.py). When it's None everything is interpreted.
+        self.code_cache = None
+        # optional sampling profiler (see profiler.py), None means no profiling at all
+        self.profiler = None
+        # optional wait loop skipping (see idle.py), None runs every instruction
+        self.idle = None
+        # optional sound output (see audio.py), told about every timer tick. None is silent.
+        self.audio = None
+        if jit:
+            from .jit import BlockCache
+            self.code_cache = BlockCache()
+        if idle:
+            from .idle import IdleLoops
+            self.idle = IdleLoops()
+        #loading the ROM
+        if rom_path is not None:
+            self.load_rom(rom_path)
+        #loading the fonts
+        self.memory[0:len(self.fonts)] = self.fonts
+        if profile.schip:
+            self.memory[BIG_FONT_START:BIG_FONT_START + len(self.big_fonts)] = self.big_fonts
+
+        # a small map that helps keep track at what point in memory certain font characters are stored.
+        self.font_map = {
+                0 : 0,
+                1 : 5,
+                2 : 10,
+                3 : 15,
+                4 : 20,
+                5 : 25,
+                6 : 30,
+                7 : 35,
+                8 : 40,
+                9 : 45,
+                0xa : 50,
+                0xb : 55,
+                0xc : 60,
+                0xd : 65,
+                0xe : 70,
+                0xf : 75,
+            }
+
+    def key_down(self, key):
+        # key is a CHIP-8 key value, 0x0 - 0xF
+        key &= 0xf
+        self.keys |= 1 << key
+        if self.waiting_key is not None:
+            # wakes up a CPU that's blocked on Fx0A, it continues after the Fx0A
+            self.gpio[self.waiting_key] = key
+            self.waiting_key = None
+            self.pc += 2
+
+    def key_up(self, key):
+        self.keys &= ~(1 << (key & 0xf))
+
+    def load_rom(self, rom_path):
+        #loading a ROM to the memory. The file is mapped instead of read, so the only copy
+        #made is the one straight into the emulator's memory.
+        with open(rom_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            check_rom_size(size, rom_path)
+            # an empty file can't be mapped, but there's nothing to copy anyway
+            if size > 0:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self.memory[PROGRAM_START:PROGRAM_START + size] = data
+        if self.code_cache is not None:
+            self.code_cache.clear()
+        if self.idle is not None:
+            self.idle.scan(self.memory, self.profile)
+
+    def load_rom_bytes(self, data):
+        # same as load_rom() but for a ROM that's already in memory (bytes, bytearray, memoryview...)
+        data = memoryview(data)
+        check_rom_size(data.nbytes, "ROM")
+        self.memory[PROGRAM_START:PROGRAM_START + data.nbytes] = data
+        if self.code_cache is not None:
+            self.code_cache.clear()
+        if self.idle is not None:
+            self.idle.scan(self.memory, self.profile)
+
+    # all of the fonts
+    fonts = [0xf0, 0x90, 0x90, 0x90, 0xf0,
+            0x20, 0x60, 0x20, 0x20, 0x70,
+            0xf0, 0x10, 0xf0, 0x80, 0xf0,
+            0xf0, 0x10, 0xf0, 0x10, 0xf0,
+            0x90, 0x90, 0xf0, 0x10, 0x10,
+            0xf0, 0x80, 0xf0, 0x10, 0xf0,
+            0xf0, 0x80, 0xf0, 0x90, 0xf0,
+            0xf0, 0x10, 0x20, 0x40, 0x40,
+            0xf0, 0x90, 0xf0, 0x90, 0xf0,
+            0xf0, 0x90, 0xf0, 0x10, 0xf0,
+            0xf0, 0x90, 0xf0, 0x90, 0x90,
+            0xe0, 0x90, 0xe0, 0x90, 0xe0,
+            0xf0, 0x80, 0xf0, 0x80, 0xf0,
+            0xe0, 0x90, 0x90, 0x90, 0xe0,
+            0xf0, 0x80, 0xf0, 0x80, 0xf0,
+            0xf0, 0x80, 0xf0, 0x80, 0x80]
+
+    # SCHIP's 8x10 font, Fx30 points I at these
+    big_fonts = [0xff, 0xff, 0xc3, 0xc3, 0xc3, 0xc3, 0xc3, 0xc3, 0xff, 0xff,
+            0x18, 0x78, 0x78, 0x18, 0x18, 0x18, 0x18, 0x18, 0xff, 0xff,
+            0xff, 0xff, 0x03, 0x03, 0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff,
+            0xff, 0xff, 0x03, 0x03, 0xff, 0xff, 0x03, 0x03, 0xff, 0xff,
+            0xc3, 0xc3, 0xc3, 0xc3, 0xff, 0xff, 0x03, 0x03, 0x03, 0x03,
+            0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff, 0x03, 0x03, 0xff, 0xff,
+            0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff, 0xc3, 0xc3, 0xff, 0xff,
+            0xff, 0xff, 0x03, 0x03, 0x06, 0x0c, 0x18, 0x18, 0x18, 0x18,
+            0xff, 0xff, 0xc3, 0xc3, 0xff, 0xff, 0xc3, 0xc3, 0xff, 0xff,
+            0xff, 0xff, 0xc3, 0xc3, 0xff, 0xff, 0x03, 0x03, 0xff, 0xff,
+            0x7e, 0xff, 0xc3, 0xc3, 0xc3, 0xff, 0xff, 0xc3, 0xc3, 0xc3,
+            0xfc, 0xfc, 0xc3, 0xc3, 0xfc, 0xfc, 0xc3, 0xc3, 0xfc, 0xfc,
+            0x3c, 0xff, 0xc3, 0xc0, 0xc0, 0xc0, 0xc0, 0xc3, 0xff, 0x3c,
+            0xfc, 0xfe, 0xc3, 0xc3, 0xc3, 0xc3, 0xc3, 0xc3, 0xfe, 0xfc,
+            0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff,
+            0xff, 0xff, 0xc0, 0xc0, 0xff, 0xff, 0xc0, 0xc0, 0xc0, 0xc0]
+
+
+    def step(self):
+        # executes a single instruction
+        pc = self.pc
+        # 16-bit opcode
+        self.opcode = opcode = (self.memory[pc] << 8 | self.memory[pc + 1])
+        if self.trace is not None:
+            self.trace(self, pc, opcode)
+        # setting PC to next instruction for next cycle
+        self.pc = pc + 2
+        self.decoded[opcode](self)
+
+    def run(self, n_cycles):
+        # executes n_cycles instructions and returns, no GUI involved
+        if self.trace is not None:
+            step = self.step
+            for _ in range(n_cycles):
+                step()
+        elif self.profiler is not None:
+            self.profiler.run(self, n_cycles)
+        elif self.idle is not None:
+            self.idle.run(self, n_cycles)
+        else:
+            self.execute(n_cycles)
+
+    def execute(self, n_cycles):
+        # runs n_cycles instructions through the translation cache if there is one,
+        # through the interpreter otherwise
+        if self.code_cache is not None:
+            self.code_cache.run(self, n_cycles)
+        else:
+            self.interpret(n_cycles)
+
+    def interpret(self, n_cycles):
+        # same as step() but without looking at the trace hook for every instruction
+        memory = self.memory
+        decoded = self.decoded
+        for _ in range(n_cycles):
+            pc = self.pc
+            self.opcode = opcode = (memory[pc] << 8 | memory[pc + 1])
+            self.pc = pc + 2
+            decoded[opcode](self)
+
+    def save_state(self):
+        # packs the whole machine into a compact binary blob, see STATE_HEADER for the layout
+        if self.packed_rng is None:
+            rng_version, rng_words, gauss = self.rng.getstate()
+            self.packed_rng = (rng_version, RNG_STATE.pack(*rng_words), gauss)
+        rng_version, rng_words, gauss = self.packed_rng
+        waiting_key = NOT_WAITING if self.waiting_key is None else self.waiting_key
+        return b"".join((
+            STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, self.pc, self.index & 0xffff,
+                              self.opcode, self.delay_timer, self.sound_timer, self.keys,
+                              waiting_key, self.draw_flag, rng_version, gauss is not None, gauss or 0.0,
+                              len(self.stack), self.profile.code(), self.height == 64),
+            bytes(self.gpio),
+            bytes(self.flags),
+            self.memory,
+            pack_display(self.display),
+            rng_words,
+            struct.pack("<%dH" % len(self.stack), *self.stack),
+        ))
+
+    def load_state(self, blob):
+        # restores a blob made by save_state(), the emulator ends up exactly where it was
+        (magic, version, self.pc, self.index, self.opcode, self.delay_timer, self.sound_timer,
+         self.keys, waiting_key, draw_flag, rng_version, has_gauss, gauss, depth, profile,
+         hires) = STATE_HEADER.unpack_from(blob)
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError("not a version %d emulator state" % STATE_VERSION)
+        if profile != self.profile.code():
+            raise ValueError("the state was saved by an emulator with a different machine profile")
+        offset = STATE_HEADER.size
+        self.gpio[:] = blob[offset:offset + 16]
+        offset += 16
+        self.flags[:] = blob[offset:offset + 8]
+        offset += 8
+        self.memory[:] = blob[offset:offset + MEMORY_SIZE]
+        offset += MEMORY_SIZE
+        self.set_resolution(hires)
+        display = HIRES_DISPLAY_STATE if hires else DISPLAY_STATE
+        self.display[:] = unpack_display(blob[offset:offset + display.size])
+        offset += display.size
+        packed_words = bytes(blob[offset:offset + RNG_STATE.size])
+        offset += RNG_STATE.size
+        gauss = gauss if has_gauss else None
+        self.rng.setstate((rng_version, RNG_STATE.unpack(packed_words), gauss))
+        self.packed_rng = (rng_version, packed_words, gauss)
+        self.stack[:] = struct.unpack_from("<%dH" % depth, blob, offset)
+        self.waiting_key = None if waiting_key == NOT_WAITING else waiting_key
+        self.draw_flag = bool(draw_flag)
+        if self.code_cache is not None:
+            self.code_cache.clear()
+        if self.idle is not None:
+            self.idle.scan(self.memory, self.profile)
+
+    def tick_timers(self):
+        # counts both timers down, has to be called 60 times per second (see scheduler.py)
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+        # the buzzer sounds for every tick the sound timer is running
+        if self.audio is not None:
+            self.audio.tick(self.sound_timer > 0)
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+
+    def clear_display(self):
+        self.display[:] = [0] * self.height
+        self.draw_flag = True
+
+    def set_resolution(self, hires):
+        # switches between 64x32 and SCHIP's 128x64, the screen is cleared when it changes
+        width, height = (128, 64) if hires else (64, 32)
+        if height != self.height:
+            self.width = width
+            self.height = height
+            self.row_mask = (1 << width) - 1
+            self.clear_display()
+
+    # all of the instructions. The operands are already taken apart by decode(), so every
+    # handler gets exactly the pieces of the opcode it needs.
+    def _00E0(self):
+        # Clearing the screen.
+        self.clear_display()
+
+    def _00EE(self):
+        # Sets the program counter to the address at the top of the stack, then subtracts 1 from the stack pointer.
+        self.pc = self.stack.pop()
+
+    def _00Cn(self, n):
+        # SCHIP: scroll the display down n rows. The whole framebuffer moves as a list of rows.
+        display = self.display
+        display[n:] = display[:len(display) - n]
+        display[:n] = [0] * n
+        self.draw_flag = True
+
+    def _00FB(self):
+        # SCHIP: scroll the display right by 4 pixels, one shift per row
+        self.display[:] = [row >> 4 for row in self.display]
+        self.draw_flag = True
+
+    def _00FC(self):
+        # SCHIP: scroll the display left by 4 pixels
+        mask = self.row_mask
+        self.display[:] = [(row << 4) & mask for row in self.display]
+        self.draw_flag = True
+
+    def _00FD(self):
+        # SCHIP: exit the interpreter. There's nothing to exit to, so the CPU stays on this instruction.
+        self.pc -= 2
+
+    def _00FE(self):
+        # SCHIP: switch to the 64x32 display
+        self.set_resolution(False)
+
+    def _00FF(self):
+        # SCHIP: switch to the 128x64 display
+        self.set_resolution(True)
+
+    def _0nnn(self, nnn):
+        # Jump to a machine code routine at nnn. Only the original COSMAC VIP could do that,
+        # like most interpreters this one ignores it.
+        pass
+
+    def _1nnn(self, nnn):
+        # The interpreter sets the program counter to nnn.
+        self.pc = nnn
+
+    def _2nnn(self, nnn):
+        # The interpreter increments the stack pointer, then puts the current PC on the top of the stack. The PC is then set to nnn.
+        if len(self.stack) == STACK_DEPTH:
+            # same kind of error as 00EE on an empty stack
+            raise IndexError("stack overflow, more than %d nested calls" % STACK_DEPTH)
+        self.stack.append(self.pc)
+        self.pc = nnn
+
+    def _3xkk(self, x, kk):
+        # The interpreter compares register Vx to kk, and if they are equal, increments the program counter by 2.
+        if self.gpio[x] == kk:
+            self.pc += 2
+
+    def _4xkk(self, x, kk):
+        # The interpreter compares register Vx to kk, and if they are not equal, increments the program counter by 2.
+        if self.gpio[x] != kk:
+            self.pc += 2
+
+    def _5xy0(self, x, y):
+        # The interpreter compares register Vx to register Vy, and if they are equal, increments the program counter by 2.
+        if self.gpio[x] == self.gpio[y]:
+            self.pc += 2
+
+    def _6xkk(self, x, kk):
+        # The interpreter puts the value kk into register Vx.
+        self.gpio[x] = kk
+
+    def _7xkk(self, x, kk):
+        # Adds the value kk to the value of register Vx, then stores the result in Vx.
+        self.gpio[x] = (self.gpio[x] + kk) & 0xff
+
+    def _8xy0(self, x, y):
+        # Stores the value of register Vy in register Vx.
+        self.gpio[x] = self.gpio[y]
+
+    def _8xy1(self, x, y):
+        # Performs a bitwise OR on the values of Vx and Vy, then stores the result in Vx. A bitwise OR compares the corrseponding bits from two values, and if either bit is 1, then the same bit in the result is also 1. Otherwise, it is 0
+        self.gpio[x] = self.gpio[x] | self.gpio[y]
+
+    def _8xy2(self, x, y):
+        # Performs a bitwise AND on the values of Vx and Vy, then stores the result in Vx. A bitwise AND compares the corrseponding bits from two values, and if both bits are 1, then the same bit in the result is also 1. Otherwise, it is 0.
+        self.gpio[x] = self.gpio[x] & self.gpio[y]
+
+    def _8xy3(self, x, y):
+        # Performs a bitwise exclusive OR on the values of Vx and Vy, then stores the result in Vx. An exclusive OR compares the corrseponding bits from two values, and if the bits are not both the same, then the corresponding bit in the result is set to 1. Otherwise, it is 0
+        self.gpio[x] = self.gpio[x] ^ self.gpio[y]
+
+    def _8xy4(self, x, y):
+        # The values of Vx and Vy are added together. If the result is greater than 8 bits (i.e., > 255,) VF is set to 1, otherwise 0. Only the lowest 8 bits of the result are kept, and stored in Vx.
+        result = self.gpio[x] + self.gpio[y]
+        if result > 255:
+            self.gpio[0xf] = 1
+        else:
+            self.gpio[0xf] = 0
+        self.gpio[x] = result & 0x00ff
+
+    def _8xy5(self, x, y):
+        # If Vx > Vy, then VF is set to 1, otherwise 0. Then Vy is subtracted from Vx, and the results stored in Vx.
+        if self.gpio[x] > self.gpio[y]:
+            self.gpio[0xf] = 1
+        else:
+            self.gpio[0xf] = 0
+        self.gpio[x] = (self.gpio[x] - self.gpio[y]) & 0xff
+
+    def _8xy6(self, x, y):
+        # If the least-significant bit of Vx is 1, then VF is set to 1, otherwise 0. Then Vx is divided by 2.
+        if (self.gpio[x] & 1) == 1:
+            self.gpio[0xf] = 1
+        else:
+            self.gpio[0xf] = 0
+        self.gpio[x] = self.gpio[x] >> 1
+
+    def _8xy7(self, x, y):
+        # If Vy > Vx, then VF is set to 1, otherwise 0. Then Vx is subtracted from Vy, and the results stored in Vx.
+        if self.gpio[y] > self.gpio[x]:
+            self.gpio[0xf] = 1
+        else:
+            self.gpio[0xf] = 0
+        self.gpio[x] = (self.gpio[y] - self.gpio[x]) & 0xff
+
+    def _8xyE(self, x, y):
+        # If the most-significant bit of Vx is 1, then VF is set to 1, otherwise to 0. Then Vx is multiplied by 2.
+        if ((self.gpio[x] & 128) >> 7) == 1:
+            self.gpio[0xf] = 1
+        else:
+            self.gpio[0xf] = 0
+        self.gpio[x] = (self.gpio[x] << 1) & 0xff
+
+    def _8xy6_shift_vy(self, x, y):
+        # 8xy6 with the shift_vy quirk: Vy shifted right by one goes into Vx, VF gets the bit shifted out.
+        value = self.gpio[y]
+        self.gpio[x] = value >> 1
+        self.gpio[0xf] = value & 1
+
+    def _8xyE_shift_vy(self, x, y):
+        # 8xyE with the shift_vy quirk: Vy shifted left by one goes into Vx, VF gets the bit shifted out.
+        value = self.gpio[y]
+        self.gpio[x] = (value << 1) & 0xff
+        self.gpio[0xf] = value >> 7
+
+    def _9xy0(self, x, y):
+        # Skip next instruction if Vx != Vy.
+        if (self.gpio[x] != self.gpio[y]):
+            self.pc += 2
+
+    def _Annn(self, nnn):
+        # The value of register I is set to nnn.
+        self.index = nnn
+
+    def _Bnnn(self, nnn):
+        # The program counter is set to nnn plus the value of V0.
+        self.pc = nnn + self.gpio[0]
+
+    def _Cxkk(self, x, kk):
+        # The interpreter generates a random number from 0 to 255, which is then ANDed with the value kk. The results are stored in Vx.
+        self.gpio[x] = self.rng.randint(0, 255) & kk
+        self.packed_rng = None
+
+    def _Dxyn(self, x, y, n):
+        # Display n-byte sprite starting at memory location I at (Vx, Vy), set VF = collision.
+        self.draw_sprite(self.gpio[x], self.gpio[y], self.index, n)
+
+    def _Dxy0(self, x, y):
+        # SCHIP: display a 16x16 sprite (2 bytes per row) starting at memory location I at (Vx, Vy), set VF = collision.
+        data = self.memory[self.index:self.index + 32]
+        rows = [data[i] << 8 | data[i + 1] for i in range(0, len(data) - 1, 2)]
+        self.blit(self.gpio[x], self.gpio[y], rows, 16)
+
+    def draw_sprite(self, x, y, address, n):
+        # XORs an n-byte sprite stored at address onto the framebuffer, sets VF on collision
+        self.blit(x, y, self.memory[address:address + n], 8)
+
+    def blit(self, x, y, rows, bits):
+        # every row of the framebuffer is one int, so a sprite row (bits wide) is moved into
+        # place with a single rotate (which also wraps it around the right edge), collision is
+        # a single AND and drawing is a single XOR, no matter how many pixels are lit.
+        display = self.display
+        width = self.width
+        height = self.height
+        mask = self.row_mask
+        clip = self.profile.clip_sprites
+        x &= width - 1
+        y &= height - 1
+        shift = width - bits
+        collision = 0
+        for sprite_row in rows:
+            line = sprite_row << shift
+            if clip:
+                line >>= x
+            else:
+                line = ((line >> x) | (line << (width - x))) & mask
+            row = display[y]
+            collision |= row & line
+            display[y] = row ^ line
+            # sprites that go past the bottom edge wrap around to the top, or are cut off there
+            y += 1
+            if y == height:
+                if clip:
+                    break
+                y = 0
+        # in case no pixel is erased, VF will stay 0, else it will be 1
+        self.gpio[0xf] = 1 if collision else 0
+        self.draw_flag = True
+
+    def test_draw(self, x, y, n, letter):
+        # just for testing and debugging purposes, has no usage by actual programs
+        self.draw_sprite(x, y, self.font_map[letter], n)
+
+    def _Ex9E(self, x):
+        # Skip next instruction if key with the value of Vx is pressed.
+        if self.keys >> (self.gpio[x] & 0xf) & 1:
+            self.pc += 2
+
+    def _ExA1(self, x):
+        # Skip next instruction if key with the value of Vx is not pressed.
+        if not self.keys >> (self.gpio[x] & 0xf) & 1:
+            self.pc += 2
+
+    def _Fx07(self, x):
+        # The value of DT is placed into Vx.
+        self.gpio[x] = self.delay_timer
+
+    def _Fx0A(self, x):
+        # Wait for a key press, store the value of the key in Vx.
+        # a key that's already held down is taken straight away. Otherwise the CPU blocks:
+        # the PC stays on this instruction and waiting_key is set, the scheduler doesn't run
+        # the CPU until key_down() stores the key and moves the PC past the Fx0A.
+        if self.keys:
+            self.gpio[x] = (self.keys & -self.keys).bit_length() - 1
+            return
+        self.waiting_key = x
+        self.pc -= 2
+
+    def _Fx15(self, x):
+        # DT is set equal to the value of Vx.
+        self.delay_timer = self.gpio[x]
+
+    def _Fx18(self, x):
+        # ST is set equal to the value of Vx.
+        self.sound_timer = self.gpio[x]
+
+    def _Fx1E(self, x):
+        # The values of I and Vx are added, and the results are stored in I. I is 16 bits wide,
+        # like in save_state(), so a ROM that keeps adding can't grow it past what a state holds
+        self.index = (self.index + self.gpio[x]) & 0xffff
+
+    def _Fx29(self, x):
+        # The value of I is set to the location for the hexadecimal sprite corresponding to the value of Vx
+        self.index = self.font_map[self.gpio[x] & 0xf]
+
+    def _Fx30(self, x):
+        # SCHIP: I is set to the location of the 8x10 sprite for the hexadecimal digit in Vx
+        self.index = BIG_FONT_START + (self.gpio[x] & 0xf) * 10
+
+    def _Fx33(self, x):
+        # originally I made a crude attempt, this solution I found online in another emulator on GitHub, but works just like mine
+        # Store BCD representation of Vx in memory locations I, I+1, I+2
+        value = self.gpio[x]
+        check_address(self.index + 3)
+        self.memory[self.index:self.index + 3] = (value // 100, (value % 100) // 10, value % 10)
+        if self.code_cache is not None:
+            self.code_cache.invalidate(self.index, self.index + 3)
+
+    def _Fx55(self, x):
+        # The interpreter copies the values of registers V0 through Vx into memory, starting at the address in I.
+        check_address(self.index + x + 1)
+        self.memory[self.index:self.index + x + 1] = self.gpio[:x + 1]
+        if self.code_cache is not None:
+            self.code_cache.invalidate(self.index, self.index + x + 1)
+
+    def _Fx65(self, x):
+        # Read registers V0 through Vx from memory starting at location I
+        check_address(self.index + x + 1)
+        self.gpio[:x + 1] = self.memory[self.index:self.index + x + 1]
+
+    def _Fx55_increment(self, x):
+        # Fx55 with the load_store_increment quirk, I ends up right after the last register stored
+        self._Fx55(x)
+        self.index += x + 1
+
+    def _Fx65_increment(self, x):
+        # Fx65 with the load_store_increment quirk
+        self._Fx65(x)
+        self.index += x + 1
+
+    def _Fx75(self, x):
+        # SCHIP: store V0 through Vx (x <= 7) in the flag registers
+        self.flags[:x + 1] = self.gpio[:x + 1]
+
+    def _Fx85(self, x):
+        # SCHIP: read V0 through Vx (x <= 7) from the flag registers
+        self.gpio[:x + 1] = self.flags[:x + 1]
+
+    def _illegal(self, opcode):
+        # anything decode() doesn't recognise ends up here
+        raise IllegalInstruction(self.pc - 2, opcode)
+
+
+class IllegalInstruction(Exception):
+    # raised when the emulator runs into an opcode that isn't a CHIP-8 instruction
+    def __init__(self, pc, opcode):
+        Exception.__init__(self, "illegal instruction %04X at %03X" % (opcode, pc))
+        self.pc = pc
+        self.opcode = opcode
+
+
+class RomError(ValueError):
+    # raised when a ROM can't be loaded, e.g. it doesn't fit into memory
+    pass
+
+
+def check_rom_size(size, name):
+    if size > MAX_ROM_SIZE:
+        raise RomError("%s is %d bytes, but only %d bytes fit between 0x200 and 0xFFF"
+                       % (name, size, MAX_ROM_SIZE))
+
+
+def check_address(end):
+    # slice copies would quietly grow or shrink memory/registers instead of failing,
+    # so copies running past the end of memory are stopped here
+    if end > MEMORY_SIZE:
+        raise IndexError("memory access up to %03X is past the end of memory" % (end - 1))
+
+
+def pack_display(display):
+    # the framebuffer as bytes, 8 per row in lo-res and 16 per row in hi-res
+    if len(display) == 32:
+        return DISPLAY_STATE.pack(*display)
+    return HIRES_DISPLAY_STATE.pack(*[half for row in display for half in (row >> 64, row & ROW_MASK)])
+
+
+def unpack_display(data):
+    # the other way around, the resolution is told by the size
+    if len(data) == DISPLAY_STATE.size:
+        return list(DISPLAY_STATE.unpack(data))
+    halves = HIRES_DISPLAY_STATE.unpack(data)
+    return [halves[i] << 64 | halves[i + 1] for i in range(0, len(halves), 2)]
+
+
+# second level of decoding for the families where the last nibble (8xyN) or the
+# last byte (ExNN, FxNN) picks the instruction
+ALU_OPS = {0x0: Emulator._8xy0, 0x1: Emulator._8xy1, 0x2: Emulator._8xy2,
+           0x3: Emulator._8xy3, 0x4: Emulator._8xy4, 0x5: Emulator._8xy5,
+           0x6: Emulator._8xy6, 0x7: Emulator._8xy7, 0xE: Emulator._8xyE}
+KEY_OPS = {0x9E: Emulator._Ex9E, 0xA1: Emulator._ExA1}
+MISC_OPS = {0x07: Emulator._Fx07, 0x0A: Emulator._Fx0A, 0x15: Emulator._Fx15,
+            0x18: Emulator._Fx18, 0x1E: Emulator._Fx1E, 0x29: Emulator._Fx29,
+            0x33: Emulator._Fx33, 0x55: Emulator._Fx55, 0x65: Emulator._Fx65}
+# the SCHIP additions
+SCHIP_SYSTEM_OPS = {0x00FB: Emulator._00FB, 0x00FC: Emulator._00FC, 0x00FD: Emulator._00FD,
+                    0x00FE: Emulator._00FE, 0x00FF: Emulator._00FF}
+SCHIP_MISC_OPS = {0x30: Emulator._Fx30, 0x75: Emulator._Fx75, 0x85: Emulator._Fx85}
+
+
+def decode(opcode, profile=CHIP8):
+    # takes a single opcode apart, returns (handler, operands) so the instruction can be run
+    # as handler(emulator, *operands). What an opcode means depends on the machine profile.
+    family = opcode >> 12
+    x = (opcode & 0x0f00) >> 8
+    y = (opcode & 0x00f0) >> 4
+    n = opcode & 0x000f
+    kk = opcode & 0x00ff
+    nnn = opcode & 0x0fff
+    if family == 0x0:
+        if profile.schip:
+            if opcode & 0xfff0 == 0x00c0:
+                return Emulator._00Cn, (n,)
+            if opcode in SCHIP_SYSTEM_OPS:
+                return SCHIP_SYSTEM_OPS[opcode], ()
+        if opcode == 0x00e0:
+            return Emulator._00E0, ()
+        if opcode == 0x00ee:
+            return Emulator._00EE, ()
+        return Emulator._0nnn, (nnn,)
+    if family == 0x1:
+        return Emulator._1nnn, (nnn,)
+    if family == 0x2:
+        return Emulator._2nnn, (nnn,)
+    if family == 0x3:
+        return Emulator._3xkk, (x, kk)
+    if family == 0x4:
+        return Emulator._4xkk, (x, kk)
+    if family == 0x5 and n == 0:
+        return Emulator._5xy0, (x, y)
+    if family == 0x6:
+        return Emulator._6xkk, (x, kk)
+    if family == 0x7:
+        return Emulator._7xkk, (x, kk)
+    if family == 0x8 and n in ALU_OPS:
+        if profile.shift_vy and n == 0x6:
+            return Emulator._8xy6_shift_vy, (x, y)
+        if profile.shift_vy and n == 0xE:
+            return Emulator._8xyE_shift_vy, (x, y)
+        return ALU_OPS[n], (x, y)
+    if family == 0x9 and n == 0:
+        return Emulator._9xy0, (x, y)
+    if family == 0xA:
+        return Emulator._Annn, (nnn,)
+    if family == 0xB:
+        return Emulator._Bnnn, (nnn,)
+    if family == 0xC:
+        return Emulator._Cxkk, (x, kk)
+    if family == 0xD:
+        if n == 0 and profile.schip:
+            return Emulator._Dxy0, (x, y)
+        return Emulator._Dxyn, (x, y, n)
+    if family == 0xE and kk in KEY_OPS:
+        return KEY_OPS[kk], (x,)
+    if family == 0xF and profile.schip and kk in SCHIP_MISC_OPS and (kk == 0x30 or x <= 7):
+        return SCHIP_MISC_OPS[kk], (x,)
+    if family == 0xF and profile.load_store_increment and kk in (0x55, 0x65):
+        return (Emulator._Fx55_increment if kk == 0x55 else Emulator._Fx65_increment), (x,)
+    if family == 0xF and kk in MISC_OPS:
+        return MISC_OPS[kk], (x,)
+    return Emulator._illegal, (opcode,)
+
+
+def specialize(handler, operands):
+    # wraps a decoded instruction into a function of just the emulator, with the operands
+    # baked in, calling that is about twice as fast as handler(emulator, *operands)
+    if len(operands) == 0:
+        return handler
+    if len(operands) == 1:
+        a, = operands
+        return lambda emulator: handler(emulator, a)
+    if len(operands) == 2:
+        a, b = operands
+        return lambda emulator: handler(emulator, a, b)
+    a, b, c = operands
+    return lambda emulator: handler(emulator, a, b, c)
+
+
+class DecodeTable(dict):
+    # opcode -> specialized function for all 65536 opcodes. Every opcode is decoded only once,
+    # the first time it's looked up, after that it's a single dict lookup. Filling it lazily
+    # instead of decoding all 65536 up front keeps creating an Emulator cheap, a ROM only
+    # ever uses a few hundred different opcodes anyway.
+    def __init__(self, profile=CHIP8):
+        dict.__init__(self)
+        self.profile = profile
+
+    def __missing__(self, opcode):
+        entry = self[opcode] = specialize(*decode(opcode & 0xffff, self.profile))
+        return entry
+
+
+# profile -> its DecodeTable, shared by all emulators with that profile since decoding
+# doesn't depend on the machine state
+DECODE_TABLES = {}
+
+
+def decode_table(profile):
+    table = DECODE_TABLES.get(profile)
+    if table is None:
+        table = DECODE_TABLES[profile] = DecodeTable(profile)
+    return table
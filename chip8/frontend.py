@@ -0,0 +1,156 @@
+from tkinter import Tk, Canvas, PhotoImage, NW
+from time import monotonic
+from .audio import Audio
+from .scheduler import Scheduler
+from .rewind import RewindBuffer, BUDGET_MB
+
+
+class FramePresenter:
+    # shows the emulator's framebuffer on a canvas through one PhotoImage instead of a
+    # rectangle per pixel. present() compares the framebuffer with the frame that's on
+    # screen and only pushes the rows that changed, every row is a single put() that
+    # Tk tiles over the size x size block of screen lines it covers. The window stays the same
+    # size in SCHIP hi-res, the 128x64 pixels are just half as big.
+    def __init__(self, canvas, size, fg="#000000", bg="#ffffff"):
+        self.size = size
+        self.fg = fg
+        self.bg = bg
+        self.image = PhotoImage(width=64*size, height=32*size)
+        self.image.put(bg, to=(0, 0, 64*size, 32*size))
+        canvas.create_image(0, 0, image=self.image, anchor=NW)
+        # width of the framebuffer and how big one of its pixels is on screen
+        self.width = 64
+        self.scale = size
+        # rows currently on screen
+        self.shown = [0] * 32
+        # row value -> PhotoImage data string, games tend to reuse the same few rows
+        self.row_cache = {}
+
+    def resize(self, height):
+        # the ROM switched between low and high resolution
+        self.width = height * 2
+        self.scale = max(1, self.size * 64 // self.width)
+        self.shown = [0] * height
+        self.row_cache.clear()
+        self.image.put(self.bg, to=(0, 0, 64*self.size, 32*self.size))
+
+    def row_data(self, row):
+        data = self.row_cache.get(row)
+        if data is None:
+            pixels = []
+            width = self.width
+            for x in range(width):
+                colour = self.fg if (row >> (width - 1 - x)) & 1 else self.bg
+                pixels.extend([colour] * self.scale)
+            data = "{" + " ".join(pixels) + "}"
+            if len(self.row_cache) > 4096:
+                self.row_cache.clear()
+            self.row_cache[row] = data
+        return data
+
+    def present(self, display):
+        if len(display) != len(self.shown):
+            self.resize(len(display))
+        scale = self.scale
+        right = self.width * scale
+        shown = self.shown
+        for y in range(len(shown)):
+            row = display[y]
+            if row != shown[y]:
+                self.image.put(self.row_data(row), to=(0, y*scale, right, (y+1)*scale))
+                shown[y] = row
+
+
+class TkFrontend:
+    # Tkinter window on top of a headless Emulator. It shows the framebuffer and passes
+    # the keyboard to the emulator, the emulator itself doesn't know the window exists.
+    # Holding backspace rewinds the game frame by frame, rewind_mb is how much memory the
+    # recorded frames may take (None turns rewinding off).
+    # movie is an optional MovieRecorder (see movie.py) that gets all of the keys. Rewinding
+    # would take the game back behind the recording's back, so it's off while recording.
+    # sound is an optional sink for the beeper (see audio.py), e.g. DeviceSink() to hear it or
+    # WavSink("game.wav") to capture it. Without one the window is silent. It's closed with the window.
+    def __init__(self, emulator, size=8, cpu_hz=600, rewind_mb=BUDGET_MB, movie=None, sound=None):
+        self.emulator = emulator
+        self.scheduler = Scheduler(emulator, cpu_hz=cpu_hz)
+        # where the keys go
+        self.input = emulator
+        self.movie = movie
+        if movie is not None:
+            self.input = movie.attach(self.scheduler)
+            rewind_mb = None
+        self.rewind = None
+        if rewind_mb is not None:
+            self.rewind = RewindBuffer(emulator, budget_mb=rewind_mb).attach(self.scheduler)
+            # it has to see the keys to run frames again
+            self.input = self.rewind
+        self.rewinding = False
+        # 'size' is just an int that helps make the display bigger or smaller, 8 is a pretty good value
+        self.size = size
+
+        # used to map pressed buttons to numerical values used in programs
+        self.keymap = {
+            "1":1, "2":2, "3":3, "4":0xC,
+            "q":4, "w":5, "e":6, "r":0xD,
+            "a":7, "s":8, "d":9, "f":0xE,
+            "z":0xA, "x":0, "c":0xb, "v":0xf
+            }
+
+        # tkinter widgets to display graphics
+        self.master = Tk()
+        self.canvas = Canvas(self.master, width=64*size, height=32*size, bg="white", highlightthickness=0)
+        self.canvas.pack()
+        self.master.bind("<Key>", self.key)
+        self.master.bind("<KeyRelease>", self.keyup)
+        self.presenter = FramePresenter(self.canvas, size)
+        self.audio = None
+        if sound is not None:
+            self.audio = Audio(sound).attach(emulator)
+
+    def key(self, event):
+        if event.keysym == "BackSpace" and self.rewind is not None:
+            self.rewinding = self.scheduler.paused = True
+        elif event.char in self.keymap:
+            self.input.key_down(self.keymap[event.char])
+
+    def keyup(self, event):
+        if event.keysym == "BackSpace":
+            self.rewinding = self.scheduler.paused = False
+        elif event.char in self.keymap:
+            self.input.key_up(self.keymap[event.char])
+
+    def present(self, scheduler):
+        # called by the scheduler once per 60 Hz frame, the window is only touched here
+        emulator = self.emulator
+        if self.rewinding and self.rewind.rewind(1):
+            emulator.draw_flag = True
+        if emulator.draw_flag:
+            self.presenter.present(emulator.display)
+            emulator.draw_flag = False
+
+    def tick(self):
+        # one frame, then Tk is asked to call back when the next one is due. In between Tk
+        # sleeps in its event loop, so a game waiting on a key (or just waiting for the next
+        # frame) doesn't keep a core busy, and key events are handled as soon as they come in.
+        # Tk would print an exception raised in here and keep the window open on a frozen game,
+        # so a fault (IllegalInstruction, IndexError) stops the event loop and run() raises it
+        try:
+            deadline = self.scheduler.tick(on_frame=self.present)
+        except Exception as e:
+            self.error = e
+            self.master.quit()
+            return
+        self.master.after(max(0, int((deadline - monotonic()) * 1000)), self.tick)
+
+    def run(self):
+        self.scheduler.deadline = None
+        self.error = None
+        self.master.after(0, self.tick)
+        self.master.mainloop()
+        if self.movie is not None:
+            self.movie.close()
+        if self.audio is not None:
+            self.audio.close()
+        if self.error is not None:
+            self.master.destroy()
+            raise self.error
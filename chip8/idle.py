@@ -0,0 +1,127 @@
+from .emu import Emulator, ALU_OPS, CHIP8, MEMORY_SIZE, PROGRAM_START, decode
+
+# instructions that only read and write registers (and read memory and the keys). A loop made
+# of nothing else does the same thing every time around as long as the registers are the same.
+PURE = {Emulator._0nnn, Emulator._1nnn, Emulator._3xkk, Emulator._4xkk, Emulator._5xy0,
+        Emulator._6xkk, Emulator._7xkk, Emulator._9xy0, Emulator._Annn, Emulator._Ex9E,
+        Emulator._ExA1, Emulator._Fx07, Emulator._Fx15, Emulator._Fx18, Emulator._Fx1E,
+        Emulator._Fx29, Emulator._Fx65, Emulator._8xy6_shift_vy, Emulator._8xyE_shift_vy,
+        Emulator._Fx30, Emulator._Fx65_increment, Emulator._Fx85}
+PURE.update(ALU_OPS.values())
+# longest loop that's looked at, in instructions (the body and the jump back)
+MAX_LOOP = 32
+# instructions run between two looks at the PC, looking costs about as much as a few instructions
+CHUNK = 256
+# a loop is only tried when the budget has room for this many times its length, with less
+# than that the two trips around it cost more than what could be skipped
+MIN_ROUNDS = 4
+# a loop that didn't repeat is left alone for up to this many chunks before it's tried again
+MAX_BACKOFF = 64
+
+
+class IdleLoops:
+    # skips the time a ROM spends in wait loops like
+    #   200: F007   V0 = DT
+    #   202: 3000   skip if V0 == 0
+    #   204: 1200   jump 200
+    # Inside a frame nothing such a loop reads can change (the timers tick and the keys change
+    # between frames), so once the registers are the same two times in a row at the top of the
+    # loop, the rest of the frame would just go around the same loop over and over again.
+    #
+    # The candidates are found by scanning the ROM for backward jumps over instructions in PURE.
+    # At run time, whenever a chunk of instructions ends inside a candidate, the loop is run
+    # twice instruction by instruction and if the state repeats, all of the whole iterations
+    # that fit in the rest of the budget are skipped. At least one instruction is always run
+    # for real at the end, so opcode is left as it would have been.
+    # usage: Emulator(rom, idle=True), or emulator.idle = IdleLoops().scan(emulator.memory, emulator.profile).
+    def __init__(self):
+        # address -> (start, end, code) of the loop it's in, end is the address of the jump back
+        # and code is the loop's bytes (checked before every use, in case the ROM overwrote it)
+        self.loops = {}
+        # loop start -> (chunks to leave it alone for, how long to wait after the next miss).
+        # Loops like the ones counting a register up never repeat, this keeps them from being
+        # stepped through instruction by instruction all the time.
+        self.backoff = {}
+        # instructions skipped so far
+        self.skipped = 0
+
+    def scan(self, memory, profile=CHIP8):
+        self.loops = {}
+        self.backoff = {}
+        for end in range(PROGRAM_START, MEMORY_SIZE - 1):
+            opcode = memory[end] << 8 | memory[end + 1]
+            start = opcode & 0x0fff
+            if opcode >> 12 != 0x1 or start > end or (end - start) % 2 or end - start >= MAX_LOOP * 2:
+                continue
+            if all(decode(memory[address] << 8 | memory[address + 1], profile)[0] in PURE
+                   for address in range(start, end, 2)):
+                loop = (start, end, bytes(memory[start:end + 2]))
+                for address in range(start, end + 2, 2):
+                    # when loops overlap the innermost one is the one that matters
+                    old = self.loops.get(address)
+                    if old is None or old[1] - old[0] > end - start:
+                        self.loops[address] = loop
+        return self
+
+    def run(self, emulator, n_cycles):
+        # called by Emulator.run() in place of execute()
+        loops = self.loops
+        memory = emulator.memory
+        left = n_cycles
+        while left > 0:
+            loop = loops.get(emulator.pc)
+            if loop is not None and left >= (loop[1] - loop[0] + 2) * MIN_ROUNDS // 2 and self.ready(loop[0]):
+                if memory[loop[0]:loop[1] + 2] == loop[2]:
+                    left -= self.probe(emulator, loop, left)
+                    if left <= 0:
+                        break
+            chunk = min(left, CHUNK)
+            emulator.execute(chunk)
+            left -= chunk
+
+    def ready(self, start):
+        wait = self.backoff.get(start)
+        if wait is None or wait[0] == 0:
+            return True
+        self.backoff[start] = (wait[0] - 1, wait[1])
+        return False
+
+    def probe(self, emulator, loop, budget):
+        # runs the loop until its start comes around twice and compares the state between the
+        # two, returns how many instructions were run or skipped
+        start, end, code = loop
+        memory = emulator.memory
+        decoded = emulator.decoded
+        executed = 0
+        before = None
+        period = 0
+        while executed < budget and period <= MAX_LOOP:
+            pc = emulator.pc
+            if pc == start:
+                if before is not None:
+                    break
+                before = self.state(emulator)
+            elif not start < pc <= end:
+                # left the loop
+                before = None
+                break
+            # same as interpret(1)
+            emulator.opcode = opcode = memory[pc] << 8 | memory[pc + 1]
+            emulator.pc = pc + 2
+            decoded[opcode](emulator)
+            executed += 1
+            if before is not None:
+                period += 1
+        if before is None or emulator.pc != start or self.state(emulator) != before:
+            wait = self.backoff.get(start, (0, 0))[1]
+            self.backoff[start] = (wait, min(MAX_BACKOFF, wait * 2 or 1))
+            return executed
+        self.backoff.pop(start, None)
+        skip = max(0, budget - executed - 1) // period * period
+        self.skipped += skip
+        return executed + skip
+
+    def state(self, emulator):
+        # everything a pure loop can read or write, the stack and memory can't change in one
+        return (tuple(emulator.gpio), emulator.index, emulator.delay_timer, emulator.sound_timer,
+                emulator.keys)
@@ -0,0 +1,176 @@
+from .emu import Emulator, ALU_OPS, MEMORY_SIZE, decode
+
+# instructions that end a block: anything that can change the PC other than by stepping to
+# the next instruction, draws, and the writes into memory (which could be overwriting code)
+TERMINATORS = {Emulator._00E0, Emulator._00EE, Emulator._1nnn, Emulator._2nnn,
+               Emulator._3xkk, Emulator._4xkk, Emulator._5xy0, Emulator._9xy0,
+               Emulator._Bnnn, Emulator._Dxyn, Emulator._Ex9E, Emulator._ExA1,
+               Emulator._Fx0A, Emulator._Fx33, Emulator._Fx55, Emulator._illegal,
+               Emulator._00Cn, Emulator._00FB, Emulator._00FC, Emulator._00FD,
+               Emulator._00FE, Emulator._00FF, Emulator._Dxy0, Emulator._Fx55_increment}
+
+ALU_HANDLERS = set(ALU_OPS.values()) | {Emulator._8xy6_shift_vy, Emulator._8xyE_shift_vy}
+
+# handlers in the middle of a block that can raise (reading past the end of memory). The PC and
+# opcode are set right before they run, so a fault leaves the emulator exactly where the
+# interpreter would have left it.
+MAY_RAISE = {Emulator._Fx65, Emulator._Fx65_increment}
+
+# a block never gets longer than this, even if there's no terminator in sight
+MAX_BLOCK = 64
+
+
+# Python source for the register instructions, they are written straight into the block.
+# Everything else inside a block calls the interpreter's handler for that opcode, and
+# the statements are in the same order as in the handlers so the results are identical.
+def translate_register_op(handler, operands):
+    if handler is Emulator._0nnn:
+        return []
+    if handler is Emulator._6xkk:
+        x, kk = operands
+        return ["gpio[%d] = %d" % (x, kk)]
+    if handler is Emulator._7xkk:
+        x, kk = operands
+        return ["gpio[%d] = (gpio[%d] + %d) & 0xff" % (x, x, kk)]
+    if handler is Emulator._Annn:
+        return ["emulator.index = %d" % operands]
+    if handler not in ALU_HANDLERS:
+        return None
+    x, y = operands
+    if handler is Emulator._8xy0:
+        return ["gpio[%d] = gpio[%d]" % (x, y)]
+    if handler is Emulator._8xy1:
+        return ["gpio[%d] = gpio[%d] | gpio[%d]" % (x, x, y)]
+    if handler is Emulator._8xy2:
+        return ["gpio[%d] = gpio[%d] & gpio[%d]" % (x, x, y)]
+    if handler is Emulator._8xy3:
+        return ["gpio[%d] = gpio[%d] ^ gpio[%d]" % (x, x, y)]
+    if handler is Emulator._8xy4:
+        return ["result = gpio[%d] + gpio[%d]" % (x, y),
+                "gpio[15] = 1 if result > 255 else 0",
+                "gpio[%d] = result & 0xff" % x]
+    if handler is Emulator._8xy5:
+        return ["gpio[15] = 1 if gpio[%d] > gpio[%d] else 0" % (x, y),
+                "gpio[%d] = (gpio[%d] - gpio[%d]) & 0xff" % (x, x, y)]
+    if handler is Emulator._8xy6:
+        return ["gpio[15] = gpio[%d] & 1" % x,
+                "gpio[%d] = gpio[%d] >> 1" % (x, x)]
+    if handler is Emulator._8xy7:
+        return ["gpio[15] = 1 if gpio[%d] > gpio[%d] else 0" % (y, x),
+                "gpio[%d] = (gpio[%d] - gpio[%d]) & 0xff" % (x, y, x)]
+    if handler is Emulator._8xyE:
+        return ["gpio[15] = gpio[%d] >> 7" % x,
+                "gpio[%d] = (gpio[%d] << 1) & 0xff" % (x, x)]
+    if handler is Emulator._8xy6_shift_vy:
+        return ["value = gpio[%d]" % y,
+                "gpio[%d] = value >> 1" % x,
+                "gpio[15] = value & 1"]
+    if handler is Emulator._8xyE_shift_vy:
+        return ["value = gpio[%d]" % y,
+                "gpio[%d] = (value << 1) & 0xff" % x,
+                "gpio[15] = value >> 7"]
+    return None
+
+
+class BlockCache:
+    # translation cache that sits next to the interpreter. Straight-line runs of instructions,
+    # from some address up to and including the next jump, skip, call, draw or memory write,
+    # are turned into Python source, compiled once with compile() and kept by start address.
+    # usage: emulator.code_cache = BlockCache(), setting it back to None returns to the interpreter.
+    def __init__(self, max_block=MAX_BLOCK):
+        self.max_block = max_block
+        # start address -> (function, number of instructions in it)
+        self.blocks = {}
+        # (start address, length) -> (function, length) for blocks cut short, see run()
+        self.partial_blocks = {}
+        # memory address -> keys of the blocks that were translated from it
+        self.owners = {}
+        # lowest and highest address any block was translated from, writes outside of
+        # that range can't hit code and skip the owners lookup
+        self.low = MEMORY_SIZE
+        self.high = 0
+
+    def run(self, emulator, n_cycles):
+        # runs exactly n_cycles instructions, same as Emulator.interpret()
+        blocks = self.blocks
+        left = n_cycles
+        while left > 0:
+            block = blocks.get(emulator.pc)
+            if block is None:
+                block = self.translate(emulator, emulator.pc)
+            if block[1] > left:
+                # the block doesn't fit into what's left of the budget. The scheduler asks for
+                # the same budgets frame after frame, so the shorter block is worth keeping too.
+                key = (emulator.pc, left)
+                block = self.partial_blocks.get(key)
+                if block is None:
+                    block = self.translate(emulator, emulator.pc, left)
+            block[0](emulator)
+            left -= block[1]
+
+    def invalidate(self, start, end):
+        # called after memory[start:end] was written, drops every block that covered it
+        if end <= self.low or start >= self.high:
+            return
+        owners = self.owners
+        for address in range(start, end):
+            for key in owners.pop(address, ()):
+                if type(key) is tuple:
+                    self.partial_blocks.pop(key, None)
+                else:
+                    self.blocks.pop(key, None)
+
+    def clear(self):
+        self.blocks.clear()
+        self.partial_blocks.clear()
+        self.owners.clear()
+        self.low = MEMORY_SIZE
+        self.high = 0
+
+    def translate(self, emulator, start, max_length=None):
+        # translates the block at start, or its first max_length instructions
+        if max_length is None:
+            key = start
+            max_length = self.max_block
+        else:
+            key = (start, max_length)
+        memory = emulator.memory
+        profile = emulator.profile
+        decoded = emulator.decoded
+        lines = ["def block(emulator):", "    gpio = emulator.gpio"]
+        namespace = {}
+        address = start
+        length = 0
+        while length == 0 or (length < max_length and address + 1 < len(memory)):
+            opcode = memory[address] << 8 | memory[address + 1]
+            handler, operands = decode(opcode, profile)
+            length += 1
+            address += 2
+            if handler in TERMINATORS:
+                # the handler expects the PC to already point past it, like in the interpreter
+                namespace["op%d" % length] = decoded[opcode]
+                lines.append("    emulator.pc = %d" % address)
+                lines.append("    emulator.opcode = %d" % opcode)
+                lines.append("    op%d(emulator)" % length)
+                break
+            source = translate_register_op(handler, operands)
+            if source is None:
+                namespace["op%d" % length] = decoded[opcode]
+                source = ["op%d(emulator)" % length]
+                if handler in MAY_RAISE:
+                    source = ["emulator.pc = %d" % address, "emulator.opcode = %d" % opcode] + source
+            lines.extend("    " + line for line in source)
+        else:
+            lines.append("    emulator.pc = %d" % address)
+            lines.append("    emulator.opcode = %d" % opcode)
+        exec(compile("\n".join(lines), "<block %03X>" % start, "exec"), namespace)
+        block = (namespace["block"], length)
+        if type(key) is tuple:
+            self.partial_blocks[key] = block
+        else:
+            self.blocks[key] = block
+        for covered in range(start, address):
+            self.owners.setdefault(covered, set()).add(key)
+        self.low = min(self.low, start)
+        self.high = max(self.high, address)
+        return block
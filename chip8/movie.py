@@ -0,0 +1,179 @@
+import hashlib
+import struct
+import zlib
+from bisect import bisect_right
+
+from .emu import Emulator
+from .scheduler import Scheduler, TIMER_HZ
+
+# a movie is a header followed by records, each one a tag byte and its fields:
+#   K  frame, key | down << 4     key_down()/key_up() right before that frame ran
+#   C  frame, size, state         zlib compressed save_state() from right before that frame
+#   E  frame                      end of the movie, written by close()
+# The first record is always a checkpoint, so a movie can start in the middle of a session.
+MOVIE_MAGIC = b"C8MV"
+MOVIE_VERSION = 3
+# magic, version, has seed, seed, instructions per frame, sha1 of the ROM, name of the machine profile
+MOVIE_HEADER = struct.Struct("<4sB?qI20s8s")
+# seeds have to fit into the header's signed 64-bit field
+MIN_SEED = -1 << 63
+MAX_SEED = (1 << 63) - 1
+KEY_RECORD = struct.Struct("<IB")
+CHECKPOINT_RECORD = struct.Struct("<II")
+END_RECORD = struct.Struct("<I")
+# frames between two checkpoints, 10 seconds. Seeking never runs more frames than this.
+CHECKPOINT_INTERVAL = 600
+
+
+def rom_hash(rom_path):
+    with open(rom_path, "rb") as file:
+        return hashlib.sha1(file.read()).digest()
+
+
+class MovieRecorder:
+    # writes the keys pressed during a session to a movie file, so the session can be played
+    # back exactly (see MoviePlayer). Keys have to go through the recorder's key_down/key_up,
+    # which pass them on to the emulator, and frames are counted by the scheduler it's attached to.
+    # The movie is played back at the speed of that scheduler.
+    # usage: recorder = MovieRecorder("run.c8m", emulator, "PONG", seed).attach(scheduler),
+    # recorder.key_down(5) ..., recorder.close().
+    def __init__(self, path, emulator, rom_path, seed=None, checkpoint_interval=CHECKPOINT_INTERVAL):
+        if seed is not None and not MIN_SEED <= seed <= MAX_SEED:
+            raise ValueError("a movie can only record seeds that fit into 64 bits, not %d" % seed)
+        self.path = path
+        self.emulator = emulator
+        self.checkpoint_interval = checkpoint_interval
+        self.scheduler = None
+        self.seed = seed
+        self.digest = rom_hash(rom_path)
+        self.file = None
+
+    def attach(self, scheduler):
+        # the file is only opened and the header written here, since the number of instructions
+        # per frame comes from the scheduler
+        header = MOVIE_HEADER.pack(MOVIE_MAGIC, MOVIE_VERSION, self.seed is not None, self.seed or 0,
+                                   scheduler.cycles_per_frame, self.digest,
+                                   self.emulator.profile.name.encode("ascii"))
+        self.file = open(self.path, "wb")
+        self.scheduler = scheduler
+        self.file.write(header)
+        scheduler.frame_hooks.append(self.frame_done)
+        self.checkpoint()
+        return self
+
+    def checkpoint(self):
+        state = zlib.compress(self.emulator.save_state(), 6)
+        self.file.write(b"C" + CHECKPOINT_RECORD.pack(self.scheduler.frames, len(state)) + state)
+
+    def frame_done(self, scheduler):
+        if scheduler.frames % self.checkpoint_interval == 0:
+            self.checkpoint()
+
+    def key_down(self, key):
+        # a key that's already down can't change anything (a CPU blocked on Fx0A never has
+        # one held), so the autorepeat of the host keyboard isn't recorded
+        key &= 0xf
+        if not self.emulator.keys >> key & 1:
+            self.file.write(b"K" + KEY_RECORD.pack(self.scheduler.frames, key | 0x10))
+        self.emulator.key_down(key)
+
+    def key_up(self, key):
+        key &= 0xf
+        if self.emulator.keys >> key & 1:
+            self.file.write(b"K" + KEY_RECORD.pack(self.scheduler.frames, key))
+        self.emulator.key_up(key)
+
+    def close(self):
+        if self.file is None or self.file.closed:
+            return
+        if self.scheduler is not None:
+            self.scheduler.frame_hooks.remove(self.frame_done)
+            self.file.write(b"E" + END_RECORD.pack(self.scheduler.frames))
+        self.file.close()
+
+
+class MoviePlayer:
+    # plays a movie back on a headless emulator running unthrottled. seek(frame) goes to any
+    # frame of the movie by loading the nearest checkpoint before it and running from there.
+    # usage: player = MoviePlayer("run.c8m", "PONG"), player.seek(216000), player.emulator...
+    def __init__(self, path, rom_path, jit=False):
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, version, has_seed, seed, cycles_per_frame, digest, profile = MOVIE_HEADER.unpack_from(data)
+        if magic != MOVIE_MAGIC or version != MOVIE_VERSION:
+            raise ValueError("%s is not a version %d movie" % (path, MOVIE_VERSION))
+        if digest != rom_hash(rom_path):
+            raise ValueError("%s was recorded with a different ROM than %s" % (path, rom_path))
+        self.seed = seed if has_seed else None
+        self.profile = profile.rstrip(b"\0").decode("ascii")
+        # frame -> [(key, down)] in the order they were pressed
+        self.events = {}
+        # (frame, compressed state), sorted by frame
+        self.checkpoints = []
+        self.length = None
+        last = 0
+        offset = MOVIE_HEADER.size
+        while offset < len(data):
+            tag = data[offset:offset + 1]
+            offset += 1
+            if tag == b"K":
+                frame, key = KEY_RECORD.unpack_from(data, offset)
+                offset += KEY_RECORD.size
+                self.events.setdefault(frame, []).append((key & 0xf, bool(key & 0x10)))
+            elif tag == b"C":
+                frame, size = CHECKPOINT_RECORD.unpack_from(data, offset)
+                offset += CHECKPOINT_RECORD.size
+                self.checkpoints.append((frame, data[offset:offset + size]))
+                offset += size
+            elif tag == b"E":
+                frame, = END_RECORD.unpack_from(data, offset)
+                offset += END_RECORD.size
+                self.length = frame
+            else:
+                raise ValueError("%s is corrupt at byte %d" % (path, offset - 1))
+            last = max(last, frame)
+        if not self.checkpoints:
+            raise ValueError("%s has no checkpoints" % path)
+        if self.length is None:
+            # the recording wasn't closed (e.g. the frontend crashed), play up to the last record
+            self.length = last
+        self.checkpoint_frames = [frame for frame, state in self.checkpoints]
+        self.emulator = Emulator(rom_path, jit=jit, seed=self.seed, profile=self.profile)
+        self.scheduler = Scheduler(self.emulator, cpu_hz=cycles_per_frame * TIMER_HZ, throttle=False)
+        self.load_checkpoint(0)
+
+    @property
+    def frame(self):
+        return self.scheduler.frames
+
+    def load_checkpoint(self, number):
+        frame, state = self.checkpoints[number]
+        self.emulator.load_state(zlib.decompress(state))
+        self.scheduler.frames = frame
+
+    def seek(self, frame):
+        # puts the emulator where it was right before the given frame ran (before that frame's
+        # keys, too). Going forward from where the player is now doesn't need a checkpoint
+        # unless there's one closer to the target.
+        frame = max(self.checkpoint_frames[0], min(frame, self.length))
+        number = bisect_right(self.checkpoint_frames, frame) - 1
+        if not self.checkpoint_frames[number] <= self.frame <= frame:
+            self.load_checkpoint(number)
+        self.run_to(frame)
+
+    def run_to(self, frame, on_frame=None):
+        scheduler = self.scheduler
+        emulator = self.emulator
+        while scheduler.frames < frame:
+            for key, down in self.events.get(scheduler.frames, ()):
+                if down:
+                    emulator.key_down(key)
+                else:
+                    emulator.key_up(key)
+            scheduler.frame()
+            if on_frame is not None:
+                on_frame(scheduler)
+
+    def play(self, on_frame=None):
+        # runs the rest of the movie, on_frame(scheduler) is called after every frame
+        self.run_to(self.length, on_frame)
@@ -0,0 +1,159 @@
+import json
+from collections import Counter, deque
+from time import perf_counter
+
+from .emu import CHIP8, decode
+
+# every this many instructions one is sampled. It's prime so it doesn't line up with
+# the length of the loops in a ROM and keep sampling the same instruction.
+SAMPLE_INTERVAL = 101
+# per-frame timings kept for the report
+FRAME_HISTORY = 600
+# instruction families that count as drawing
+DRAW_FAMILIES = {"Dxyn", "00E0", "Dxy0", "00Cn", "00FB", "00FC"}
+
+
+def family(opcode, profile=CHIP8):
+    # e.g. 0x8124 -> "8xy4", 0xD015 -> "Dxyn"
+    return decode(opcode, profile)[0].__name__[1:]
+
+
+class Profiler:
+    # sampling profiler for the emulator's execution loop. Every interval-th instruction gets
+    # counted by opcode family and address, timed, and its call stack (rebuilt from the
+    # 2nnn/00EE stack) is recorded. The instructions in between run at full speed.
+    # usage: Profiler().attach(emulator, scheduler), run, then to_json() / write_collapsed().
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        # instructions left until the next sample
+        self.countdown = interval
+        self.samples = 0
+        self.families = Counter()
+        # sampled time per family, in seconds, only the sampled instructions
+        self.family_time = Counter()
+        self.pcs = Counter()
+        self.stacks = Counter()
+        self.memory = None
+        # frames: (compute, draw estimate, present) in seconds
+        self.frames = deque(maxlen=FRAME_HISTORY)
+        self.frame_count = 0
+        self.frame_totals = [0.0, 0.0, 0.0]
+        # sampled time spent in DRAW_FAMILIES, split of the compute time is estimated from it
+        self.draw_time = 0.0
+        self.sampled_time = 0.0
+
+    def attach(self, emulator, scheduler=None):
+        emulator.profiler = self
+        self.memory = emulator.memory
+        if scheduler is not None:
+            scheduler.profiler = self
+        return self
+
+    def detach(self, emulator, scheduler=None):
+        emulator.profiler = None
+        if scheduler is not None:
+            scheduler.profiler = None
+
+    def run(self, emulator, n_cycles):
+        # called by Emulator.run() in place of the normal loop
+        left = n_cycles
+        while left > 0:
+            if self.countdown > 1:
+                chunk = min(self.countdown - 1, left)
+                emulator.execute(chunk)
+                self.countdown -= chunk
+                left -= chunk
+                continue
+            self.sample(emulator)
+            self.countdown = self.interval
+            left -= 1
+
+    def sample(self, emulator):
+        pc = emulator.pc
+        memory = emulator.memory
+        opcode = memory[pc] << 8 | memory[pc + 1]
+        name = family(opcode, emulator.profile)
+        stack = self.call_stack(emulator)
+        started = perf_counter()
+        emulator.interpret(1)
+        elapsed = perf_counter() - started
+        self.samples += 1
+        self.families[name] += 1
+        self.family_time[name] += elapsed
+        self.sampled_time += elapsed
+        self.pcs[pc] += 1
+        self.stacks[stack + (name,)] += 1
+        if name in DRAW_FAMILIES:
+            self.draw_time += elapsed
+
+    def call_stack(self, emulator):
+        # the stack only has return addresses, the 2nnn right in front of each one
+        # says which subroutine was called
+        memory = emulator.memory
+        frames = ["main"]
+        for address in emulator.stack:
+            call = memory[address - 2] << 8 | memory[address - 1]
+            frames.append("sub_%03X" % (call & 0x0fff))
+        return tuple(frames)
+
+    def record_frame(self, started, computed, presented):
+        # called by the scheduler after every frame it runs
+        # the draw part of the compute time is estimated from the samples, single frames have
+        # too few of them, so the share of all the sampled time so far is used
+        compute = computed - started
+        draw = compute * self.draw_time / self.sampled_time if self.sampled_time else 0.0
+        present = presented - computed
+        self.frames.append((compute, draw, present))
+        self.frame_count += 1
+        self.frame_totals[0] += compute
+        self.frame_totals[1] += draw
+        self.frame_totals[2] += present
+
+    def hot_loops(self, count=10):
+        # every backward jump (1nnn to an earlier address) makes a loop, the loops are ranked by
+        # how many samples landed inside of them
+        loops = []
+        memory = self.memory
+        if memory is None:
+            return loops
+        for address in range(0x200, len(memory) - 1, 2):
+            opcode = memory[address] << 8 | memory[address + 1]
+            target = opcode & 0x0fff
+            if opcode >> 12 == 0x1 and target <= address:
+                hits = sum(hits for pc, hits in self.pcs.items() if target <= pc <= address)
+                if hits:
+                    loops.append({"start": target, "end": address, "samples": hits,
+                                  "share": hits / self.samples})
+        loops.sort(key=lambda loop: loop["samples"], reverse=True)
+        return loops[:count]
+
+    def report(self):
+        frames = max(1, self.frame_count)
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            "families": dict((name, {"samples": hits,
+                                     "share": hits / self.samples,
+                                     "time_share": self.family_time[name] / self.sampled_time})
+                             for name, hits in self.families.most_common()),
+            "hot_pcs": [{"pc": pc, "samples": hits} for pc, hits in self.pcs.most_common(20)],
+            "hot_loops": self.hot_loops(),
+            "frames": {
+                "count": self.frame_count,
+                "compute_ms": self.frame_totals[0] / frames * 1000,
+                "draw_ms": self.frame_totals[1] / frames * 1000,
+                "present_ms": self.frame_totals[2] / frames * 1000,
+                "recent": [list(frame) for frame in self.frames],
+            },
+        }
+
+    def to_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def write_collapsed(self, path):
+        # one "main;sub_2A4;Dxyn 12" line per distinct stack, the format flamegraph.pl
+        # and speedscope read
+        with open(path, "w") as file:
+            for stack, hits in self.stacks.most_common():
+                file.write("%s %d\n" % (";".join(stack), hits))
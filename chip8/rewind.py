@@ -0,0 +1,148 @@
+from bisect import bisect_right
+
+# default memory budget of a rewind buffer, in MB
+BUDGET_MB = 16
+# frames between two keyframes, 2 seconds. Rewinding never runs more frames than this again.
+KEYFRAME_INTERVAL = 120
+
+
+class RewindBuffer:
+    # ring buffer of the last minutes of a running emulator. The emulator is deterministic, so
+    # instead of a snapshot per frame it keeps a save_state() every keyframe_interval frames (a
+    # keyframe) and the keys pressed in between, which is enough to run any frame again. Recording
+    # a frame is only counting it, so it can be left on all the time. Rewinding into the stretch
+    # after a keyframe runs that stretch again once, keeping a state per frame, and steps back
+    # through those from then on. Once the keyframes take more than budget_mb the oldest ones (and
+    # the frames after them) are thrown away, 16 MB is over an hour of a lo-res game.
+    # Keys have to go through the buffer's key_down/key_up, which pass them on to the emulator,
+    # same as with a MovieRecorder.
+    # usage: rewind = RewindBuffer(emulator).attach(scheduler), rewind.key_down(5) ...,
+    # then rewind.rewind(frames) to step back.
+    def __init__(self, emulator, budget_mb=BUDGET_MB, keyframe_interval=KEYFRAME_INTERVAL):
+        self.emulator = emulator
+        self.keyframe_interval = keyframe_interval
+        self.max_bytes = int(budget_mb * 1024 * 1024)
+        self.scheduler = None
+        # frames recorded so far, the emulator is right after the last of them
+        self.frame = 0
+        self.next_keyframe = 0
+        # frame numbers of the keyframes and their states, oldest first
+        self.keyframe_frames = []
+        self.keyframes = []
+        self.bytes = 0
+        # frame -> [(key, down)] pressed after that frame, before the next one ran
+        self.events = {}
+        # (keyframe number, states) of the stretch that was last run again, states[n] is the
+        # emulator n frames after that keyframe
+        self.replayed = None
+
+    def attach(self, scheduler):
+        # records a frame at the end of every frame the scheduler runs, the current state is the first keyframe
+        self.scheduler = scheduler
+        scheduler.frame_hooks.append(self.record)
+        self.keyframe()
+        return self
+
+    def record(self, scheduler=None):
+        self.frame += 1
+        if self.frame >= self.next_keyframe:
+            self.keyframe()
+
+    def keyframe(self):
+        state = self.emulator.save_state()
+        self.keyframe_frames.append(self.frame)
+        self.keyframes.append(state)
+        self.bytes += len(state)
+        self.next_keyframe = self.frame + self.keyframe_interval
+        # the newest keyframe is always kept
+        while self.bytes > self.max_bytes and len(self.keyframes) > 1:
+            self.bytes -= len(self.keyframes.pop(0))
+            self.keyframe_frames.pop(0)
+            self.replayed = None
+            first = self.keyframe_frames[0]
+            for frame in [frame for frame in self.events if frame < first]:
+                del self.events[frame]
+
+    def key_down(self, key):
+        self.events.setdefault(self.frame, []).append((key, True))
+        self.emulator.key_down(key)
+
+    def key_up(self, key):
+        self.events.setdefault(self.frame, []).append((key, False))
+        self.emulator.key_up(key)
+
+    def __len__(self):
+        # number of frames that can still be rewound
+        if not self.keyframes:
+            return 0
+        return self.frame - self.keyframe_frames[0] + 1
+
+    def rewind(self, frames=1):
+        # puts the emulator back to where it was the given number of recorded frames ago and
+        # forgets everything after that, returns how many frames it actually went back.
+        # The oldest frame is never dropped, so there's always something to restore.
+        frames = min(frames, len(self) - 1)
+        if frames <= 0:
+            return 0
+        target = self.frame - frames
+        self.emulator.load_state(self.state(target))
+        self.frame = target
+        # keyframes after the target and keys pressed after it are in a future that won't happen anymore
+        number = bisect_right(self.keyframe_frames, target)
+        for state in self.keyframes[number:]:
+            self.bytes -= len(state)
+        del self.keyframes[number:]
+        del self.keyframe_frames[number:]
+        self.next_keyframe = self.keyframe_frames[-1] + self.keyframe_interval
+        for frame in [frame for frame in self.events if frame >= target]:
+            del self.events[frame]
+        replayed = self.replayed
+        if replayed is not None:
+            if replayed[0] < len(self.keyframes):
+                del replayed[1][target - self.keyframe_frames[replayed[0]] + 1:]
+            else:
+                self.replayed = None
+        return frames
+
+    def state(self, frame):
+        # save_state() of the emulator right after the given recorded frame
+        number = bisect_right(self.keyframe_frames, frame) - 1
+        start = self.keyframe_frames[number]
+        if frame == start:
+            return self.keyframes[number]
+        replayed = self.replayed
+        if replayed is None or replayed[0] != number or frame - start >= len(replayed[1]):
+            replayed = self.replayed = (number, self.replay(number, frame))
+        return replayed[1][frame - start]
+
+    def replay(self, number, end):
+        # runs the frames from keyframe number up to frame end again on the emulator, returns the
+        # state after every one of them. The scheduler's hooks are left out, and so is whatever
+        # the emulator would tell the outside world (sound, tracing, profiling).
+        emulator = self.emulator
+        cycles = self.scheduler.cycles_per_frame
+        frame = self.keyframe_frames[number]
+        states = [self.keyframes[number]]
+        emulator.load_state(states[0])
+        hooks = emulator.audio, emulator.trace, emulator.profiler
+        emulator.audio = emulator.trace = emulator.profiler = None
+        try:
+            while frame < end:
+                for key, down in self.events.get(frame, ()):
+                    if down:
+                        emulator.key_down(key)
+                    else:
+                        emulator.key_up(key)
+                # same as Scheduler.frame()
+                if emulator.waiting_key is None:
+                    emulator.run(cycles)
+                emulator.tick_timers()
+                frame += 1
+                states.append(emulator.save_state())
+        finally:
+            emulator.audio, emulator.trace, emulator.profiler = hooks
+        return states
+
+    def size(self):
+        # bytes currently used by the keyframes
+        return self.bytes
@@ -0,0 +1,87 @@
+from time import monotonic, perf_counter, sleep
+
+# the delay and sound timers count down at this rate, and it's also the rate frames are shown at
+TIMER_HZ = 60
+# sleep() is not precise enough to hit a frame deadline, the last bit of waiting is spent spinning
+SPIN_TIME = 0.002
+# if the host falls this many frames behind (e.g. the process was suspended) the clock is
+# reset instead of running all of the missed frames back to back
+MAX_LAG_FRAMES = 6
+
+
+class Scheduler:
+    # drives an Emulator in frames. Every frame runs cycles_per_frame instructions and then
+    # ticks the timers once, so the timers always see the same number of instructions between
+    # ticks whether the frames are paced to a real 60 Hz clock (throttle=True) or run as fast as
+    # the host allows (throttle=False, for batch runs), which keeps unthrottled runs deterministic.
+    def __init__(self, emulator, cpu_hz=600, throttle=True):
+        self.emulator = emulator
+        self.cpu_hz = cpu_hz
+        self.cycles_per_frame = max(1, round(cpu_hz / TIMER_HZ))
+        self.throttle = throttle
+        # number of frames run so far
+        self.frames = 0
+        # while paused, frames go by (and the frontend keeps presenting) but the emulator doesn't run
+        self.paused = False
+        # functions called as hook(scheduler) at the end of every frame that was run,
+        # e.g. the rewind buffer recording the state
+        self.frame_hooks = []
+        # optional Profiler (see profiler.py) that gets the compute and present time of every frame
+        self.profiler = None
+        # when the next frame is due when throttled, see tick()
+        self.deadline = None
+
+    def frame(self):
+        if self.paused:
+            return
+        emulator = self.emulator
+        # a CPU blocked on Fx0A is parked, only the timers (and the frontend) keep going
+        # until a key_down() wakes it up
+        if emulator.waiting_key is None:
+            emulator.run(self.cycles_per_frame)
+        emulator.tick_timers()
+        self.frames += 1
+        for hook in self.frame_hooks:
+            hook(self)
+
+    def tick(self, on_frame=None):
+        # runs one frame and calls on_frame(scheduler) after it, which is where a frontend
+        # presents the framebuffer. Returns the deadline (monotonic time) of the next frame.
+        profiler = self.profiler
+        if profiler is not None:
+            started = perf_counter()
+        self.frame()
+        if profiler is not None:
+            computed = perf_counter()
+        if on_frame is not None:
+            on_frame(self)
+        if profiler is not None:
+            profiler.record_frame(started, computed, perf_counter())
+        frame_time = 1.0 / TIMER_HZ
+        now = monotonic()
+        if self.deadline is None:
+            self.deadline = now
+        self.deadline += frame_time
+        if now - self.deadline > MAX_LAG_FRAMES * frame_time:
+            self.deadline = now
+        return self.deadline
+
+    def run(self, frames=None, on_frame=None):
+        # runs the given number of frames (forever if None), see tick()
+        self.deadline = None
+        remaining = frames
+        while remaining is None or remaining > 0:
+            deadline = self.tick(on_frame)
+            if remaining is not None:
+                remaining -= 1
+            if self.throttle:
+                wait_until(deadline)
+
+
+def wait_until(deadline):
+    # sleeps away most of the leftover time and spins for the rest
+    left = deadline - monotonic()
+    if left > SPIN_TIME:
+        sleep(left - SPIN_TIME)
+    while monotonic() < deadline:
+        pass
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import os
+import re
+import stat
+import struct
+import sys
+import threading
+from collections import deque
+
+from .emu import Emulator, IllegalInstruction, PROFILES, RomError, pack_display, unpack_display
+from .scheduler import Scheduler, wait_until
+
+# every message is a header (type, payload length) followed by the payload
+MESSAGE = struct.Struct("<BH")
+# viewer -> server: name of the session to watch, utf-8
+JOIN = 1
+# viewer -> server: key, down (0 or 1)
+KEY = 2
+# server -> viewer: frame number (uint32), number of rows (32, or 64 in SCHIP hi-res) and the
+# delta from the last frame that viewer got
+FRAME = 3
+# server -> viewer: the session doesn't exist or crashed, the connection is closed after it
+ERROR = 4
+FRAME_HEADER = struct.Struct("<IB")
+# a viewer that has this much unsent data is skipping frames until it catches up
+MAX_BACKLOG = 64 * 1024
+NONZERO = re.compile(rb"[^\x00]+")
+
+
+def encode_delta(old, new):
+    # XORs the two framebuffers (packed the same way save_state() does) and run-length encodes
+    # the result as (zero bytes to skip, length, that many XOR bytes) triples. A frame where a
+    # sprite moved is a handful of bytes, the first frame a viewer gets (or the first one after
+    # the resolution changed) is a delta against a blank screen.
+    if len(old) != len(new):
+        old = [0] * len(new)
+    xor = pack_display([a ^ b for a, b in zip(old, new)])
+    out = bytearray()
+    position = 0
+    for run in NONZERO.finditer(xor):
+        start, end = run.span()
+        gap = start - position
+        while gap > 255:
+            out += b"\xff\x00"
+            gap -= 255
+        while end - start > 255:
+            out += bytes((gap, 255)) + xor[start:start + 255]
+            start += 255
+            gap = 0
+        out += bytes((gap, end - start)) + xor[start:end]
+        position = end
+    return bytes(out)
+
+
+def apply_delta(display, delta, rows=32):
+    # the other half of encode_delta(), returns the new framebuffer rows
+    if len(display) != rows:
+        display = [0] * rows
+    xor = bytearray(len(pack_display(display)))
+    position = 0
+    offset = 0
+    while offset < len(delta):
+        gap, length = delta[offset], delta[offset + 1]
+        offset += 2
+        position += gap
+        xor[position:position + length] = delta[offset:offset + length]
+        position += length
+        offset += length
+    return [a ^ b for a, b in zip(display, unpack_display(bytes(xor)))]
+
+
+def message(kind, payload=b""):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader):
+    kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    return kind, await reader.readexactly(length)
+
+
+class Session:
+    # one emulator running throttled in a thread of its own. Key events from the viewers go
+    # through a queue that's emptied right before every frame, and every frame that changed the
+    # framebuffer is handed to the server's event loop, so neither side ever waits on the other.
+    def __init__(self, name, emulator, cpu_hz=600):
+        self.name = name
+        self.emulator = emulator
+        self.scheduler = Scheduler(emulator, cpu_hz=cpu_hz)
+        self.inputs = deque()
+        self.thread = None
+        self.stopped = threading.Event()
+        # set by the server: publish(session, frame, display) is called in the event loop,
+        # and failed(session) once if the ROM crashes
+        self.loop = None
+        self.publish = None
+        self.failed = None
+        self.error = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="chip8-%s" % self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def key(self, key, down):
+        # called from any thread, deque appends and pops are atomic
+        self.inputs.append((key, down))
+
+    def run(self):
+        scheduler = self.scheduler
+        scheduler.deadline = None
+        try:
+            while not self.stopped.is_set():
+                self.apply_inputs()
+                deadline = scheduler.tick(on_frame=self.present)
+                wait_until(deadline)
+        except (IllegalInstruction, IndexError) as e:
+            self.error = str(e)
+            if self.failed is not None:
+                self.notify(self.failed, self)
+
+    def apply_inputs(self):
+        emulator = self.emulator
+        inputs = self.inputs
+        while inputs:
+            key, down = inputs.popleft()
+            if down:
+                emulator.key_down(key)
+            else:
+                emulator.key_up(key)
+
+    def present(self, scheduler):
+        emulator = self.emulator
+        if emulator.draw_flag and self.publish is not None:
+            emulator.draw_flag = False
+            self.notify(self.publish, self, scheduler.frames, tuple(emulator.display))
+
+    def notify(self, callback, *args):
+        # hands callback(*args) to the server's event loop. The loop can be closed before the
+        # session is stopped (e.g. on Ctrl-C), anything sent after that has nobody to go to.
+        if self.loop.is_closed():
+            return
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # closed since the check
+            pass
+
+
+class Viewer:
+    def __init__(self, writer):
+        self.writer = writer
+        # the framebuffer this viewer has, its next delta is made against it
+        self.shown = (0,) * 32
+
+
+class FrameServer:
+    # serves any number of sessions to any number of viewers over a Unix socket or TCP.
+    # A viewer joins one session and from then on gets a FRAME message whenever that session's
+    # framebuffer changed, and can send KEY messages back. Deltas are encoded once per frame and
+    # shared by every viewer that's up to date, a viewer whose connection can't keep up just
+    # misses frames and gets a delta against the last one it did get.
+    # usage: server = FrameServer([Session("pong", Emulator("PONG"))]), then
+    # await server.start(path="/tmp/chip8.sock") (or host/port) and await server.serve_forever().
+    def __init__(self, sessions):
+        self.sessions = dict((session.name, session) for session in sessions)
+        self.viewers = dict((name, set()) for name in self.sessions)
+        # session name -> (frame, display, delta from the frame before)
+        self.last = dict((name, (0, (0,) * 32, b"")) for name in self.sessions)
+        self.server = None
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        loop = asyncio.get_running_loop()
+        if path is not None:
+            # a socket left behind by an earlier server is replaced, anything else at the path is
+            # more likely a typo than something that should be deleted
+            if os.path.exists(path):
+                if not stat.S_ISSOCK(os.stat(path).st_mode):
+                    raise FileExistsError("%s exists and is not a socket" % path)
+                os.unlink(path)
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port)
+        for session in self.sessions.values():
+            session.loop = loop
+            session.publish = self.publish
+            session.failed = self.failed
+            session.start()
+        return self.server
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    def close(self):
+        for session in self.sessions.values():
+            session.stop()
+        if self.server is not None:
+            self.server.close()
+
+    def publish(self, session, frame, display):
+        previous = self.last[session.name][1]
+        if display == previous:
+            # drawn over, but nothing changed (e.g. a sprite erased and drawn again in one frame)
+            return
+        shared = encode_delta(previous, display)
+        self.last[session.name] = (frame, display, shared)
+        for viewer in self.viewers[session.name]:
+            self.send(viewer, frame, display, shared if viewer.shown is previous else None)
+
+    def failed(self, session):
+        for viewer in self.viewers[session.name]:
+            viewer.writer.write(message(ERROR, session.error.encode("utf-8")))
+            viewer.writer.close()
+
+    def send(self, viewer, frame, display, delta=None):
+        transport = viewer.writer.transport
+        if transport.is_closing() or transport.get_write_buffer_size() > MAX_BACKLOG:
+            return
+        if delta is None:
+            delta = encode_delta(viewer.shown, display)
+        viewer.writer.write(message(FRAME, FRAME_HEADER.pack(frame, len(display)) + delta))
+        viewer.shown = display
+
+    async def handle(self, reader, writer):
+        viewer = Viewer(writer)
+        session = None
+        try:
+            kind, payload = await read_message(reader)
+            session = self.sessions.get(payload.decode("utf-8", "replace")) if kind == JOIN else None
+            if session is None or session.error is not None:
+                error = "no such session" if session is None else session.error
+                session = None
+                writer.write(message(ERROR, error.encode("utf-8")))
+                await writer.drain()
+                return
+            self.viewers[session.name].add(viewer)
+            frame, display, delta = self.last[session.name]
+            self.send(viewer, frame, display)
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == KEY and len(payload) == 2:
+                    session.key(payload[0] & 0xf, bool(payload[1]))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session is not None:
+                self.viewers[session.name].discard(viewer)
+            writer.close()
+
+
+class FrameClient:
+    # viewer side, e.g. for a window in another process or a test.
+    # usage: client = await FrameClient.connect("pong", path="/tmp/chip8.sock"), then
+    # async for frame, display in client.frames(): ..., and await client.key(5, True).
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.display = [0] * 32
+
+    @classmethod
+    async def connect(cls, session, path=None, host="127.0.0.1", port=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write(message(JOIN, session.encode("utf-8")))
+        await writer.drain()
+        return cls(reader, writer)
+
+    async def frames(self):
+        # yields (frame number, framebuffer rows) for every frame the server sends
+        while True:
+            try:
+                kind, payload = await read_message(self.reader)
+            except asyncio.IncompleteReadError:
+                return
+            if kind == ERROR:
+                raise ConnectionError(payload.decode("utf-8", "replace"))
+            if kind == FRAME:
+                frame, rows = FRAME_HEADER.unpack_from(payload)
+                self.display = apply_delta(self.display, payload[FRAME_HEADER.size:], rows)
+                yield frame, self.display
+
+    async def key(self, key, down):
+        self.writer.write(message(KEY, bytes((key & 0xf, 1 if down else 0))))
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CHIP-8 ROMs and stream their frames to viewers.")
+    parser.add_argument("roms", nargs="+", help="ROM files, each one becomes a session named after the file")
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--cpu-hz", type=int, default=600)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--profile", default="chip8", choices=sorted(PROFILES), help="machine profile")
+    args = parser.parse_args(argv)
+
+    sessions = []
+    names = set()
+    for rom in args.roms:
+        # viewers join by file name, so two ROMs called the same would hide one of them
+        name = os.path.basename(rom)
+        if name in names:
+            parser.error("two ROMs are called %s, sessions are named after the file" % name)
+        names.add(name)
+        try:
+            emulator = Emulator(rom, seed=args.seed, profile=args.profile)
+        except (OSError, RomError) as e:
+            sys.exit("chip8: %s" % e)
+        sessions.append(Session(name, emulator, args.cpu_hz))
+    server = FrameServer(sessions)
+
+    async def serve():
+        # the sessions are stopped while the loop they publish into is still running
+        try:
+            await server.start(path=args.unix, host=args.host, port=args.port)
+            await server.serve_forever()
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.exit("chip8: %s" % e)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import zlib
+
+# zlib level used for the deltas, they are mostly zeros so the fastest level compresses them fine
+COMPRESSION_LEVEL = 1
+
+
+def xor_bytes(a, b):
+    # XORs two blobs, the shorter one is treated as if it was padded with zeros
+    size = max(len(a), len(b))
+    result = int.from_bytes(a, "little") ^ int.from_bytes(b, "little")
+    return result.to_bytes(size, "little")
+
+
+def make_delta(previous, current):
+    # encodes current relative to previous. Between two frames almost nothing changes, so the
+    # XOR of the two states is nearly all zeros and compresses down to a few dozen bytes.
+    # The length of current is stored in front since XOR loses it when the states differ in size.
+    return len(current).to_bytes(4, "little") + zlib.compress(xor_bytes(previous, current), COMPRESSION_LEVEL)
+
+
+def apply_delta(previous, delta):
+    # inverse of make_delta(), rebuilds the state that was encoded against previous
+    size = int.from_bytes(delta[:4], "little")
+    return xor_bytes(previous, zlib.decompress(delta[4:]))[:size]
+
+
+class SnapshotHistory:
+    # keeps a long run of save_state() blobs, e.g. one per frame, without keeping them all whole.
+    # Every keyframe_interval-th snapshot is stored as is and the ones after it as deltas against
+    # the snapshot before them. When max_bytes is set, the oldest keyframe and its deltas are
+    # dropped whenever the history grows past it.
+    def __init__(self, keyframe_interval=60, max_bytes=None):
+        self.keyframe_interval = keyframe_interval
+        self.max_bytes = max_bytes
+        # list of [keyframe, delta, delta, ...] groups, oldest first
+        self.groups = []
+        # number of snapshots dropped from the front so far, indices keep counting from the first one ever added
+        self.dropped = 0
+        self.size = 0
+        # the last snapshot added, the next delta is made against it
+        self.last = None
+
+    def __len__(self):
+        return self.dropped + sum(len(group) for group in self.groups)
+
+    def append(self, state):
+        if self.last is None or len(self.groups[-1]) >= self.keyframe_interval:
+            entry = bytes(state)
+            self.groups.append([entry])
+        else:
+            entry = make_delta(self.last, state)
+            self.groups[-1].append(entry)
+        self.size += len(entry)
+        self.last = state
+        if self.max_bytes is not None:
+            # the group being written to is always kept
+            while self.size > self.max_bytes and len(self.groups) > 1:
+                group = self.groups.pop(0)
+                self.size -= sum(len(entry) for entry in group)
+                self.dropped += len(group)
+
+    def __getitem__(self, number):
+        # rebuilds snapshot number, counted from the first one ever appended
+        if number < 0:
+            number += len(self)
+        if number < self.dropped or number >= len(self):
+            raise IndexError("snapshot %d is not in the history" % number)
+        number -= self.dropped
+        for group in self.groups:
+            if number < len(group):
+                state = group[0]
+                for delta in group[1:number + 1]:
+                    state = apply_delta(state, delta)
+                return state
+            number -= len(group)
+
+    def truncate(self, length):
+        # forgets every snapshot from number length onwards, e.g. to go back and record a different future
+        while self.groups and len(self) > length:
+            group = self.groups[-1]
+            keep = len(group) - (len(self) - length)
+            if keep <= 0:
+                self.groups.pop()
+                self.size -= sum(len(entry) for entry in group)
+            else:
+                self.size -= sum(len(entry) for entry in group[keep:])
+                del group[keep:]
+        self.last = self[len(self) - 1] if self.groups else None
@@ -0,0 +1,55 @@
+import json
+import struct
+
+# one binary trace record: pc, opcode, I and V0 - VF
+RECORD = struct.Struct("<HHH16B")
+# records are collected in memory and written out in chunks of this many bytes
+BUFFER_SIZE = 1 << 16
+
+
+class BinaryTrace:
+    # trace hook that packs every executed instruction into a fixed 22-byte record.
+    # usage: emulator.trace = BinaryTrace("run.trace") ... trace.close()
+    def __init__(self, path, buffer_size=BUFFER_SIZE):
+        self.file = open(path, "wb")
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.pack = RECORD.pack
+
+    def __call__(self, emulator, pc, opcode):
+        self.buffer += self.pack(pc, opcode, emulator.index & 0xffff, *emulator.gpio)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class JsonTrace:
+    # trace hook that writes one JSON object per instruction, easier to grep than BinaryTrace
+    def __init__(self, path, buffer_size=BUFFER_SIZE):
+        self.file = open(path, "w", buffering=buffer_size)
+
+    def __call__(self, emulator, pc, opcode):
+        self.file.write(json.dumps({"pc": pc, "opcode": opcode, "i": emulator.index,
+                                    "v": emulator.gpio}, separators=(",", ":")))
+        self.file.write("\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(path):
+    # reads a file written by BinaryTrace back, yields (pc, opcode, index, registers) tuples
+    with open(path, "rb") as file:
+        data = file.read()
+    for record in RECORD.iter_unpack(data):
+        yield record[0], record[1], record[2], list(record[3:])
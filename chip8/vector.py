@@ -0,0 +1,343 @@
+from random import Random
+
+import numpy as np
+
+from .emu import Emulator, MEMORY_SIZE, PROGRAM_START, STACK_DEPTH, check_rom_size
+from .scheduler import TIMER_HZ
+
+LINE_MASK = np.uint64(0xffffffffffffffff)
+
+
+class VectorMachine:
+    # runs n independent CHIP-8 machines in lockstep, with all of their state in NumPy arrays:
+    # one row per instance. Every step fetches one instruction for every instance, groups the
+    # instances by opcode family and executes each group with masked array operations, with
+    # the same results (bit for bit) as Emulator running the same ROM with the same seed and keys.
+    #
+    # usage, gym style:
+    #   machine = VectorMachine(1024, rom_bytes, seeds=range(1024))
+    #   frames = machine.reset()
+    #   frames, info = machine.step(actions)   # actions: 16-bit key masks, one per instance
+    #
+    # An instance that would raise in Emulator (illegal instruction, stack or memory overflow)
+    # is marked in faulted and stops, the other instances carry on.
+    def __init__(self, n, rom, cpu_hz=600, seeds=None):
+        self.n = n
+        self.rom = bytes(rom)
+        check_rom_size(len(self.rom), "ROM")
+        self.cycles_per_frame = max(1, round(cpu_hz / TIMER_HZ))
+        self.seeds = list(seeds) if seeds is not None else [None] * n
+        if len(self.seeds) != n:
+            raise ValueError("%d seeds for %d instances" % (len(self.seeds), n))
+        self.lanes = np.arange(n)
+        self.reset()
+
+    def reset(self):
+        n = self.n
+        self.memory = np.zeros((n, MEMORY_SIZE), dtype=np.uint8)
+        self.memory[:, :len(Emulator.fonts)] = Emulator.fonts
+        self.memory[:, PROGRAM_START:PROGRAM_START + len(self.rom)] = np.frombuffer(self.rom, dtype=np.uint8)
+        self.gpio = np.zeros((n, 16), dtype=np.uint8)
+        self.index = np.zeros(n, dtype=np.int64)
+        self.pc = np.full(n, PROGRAM_START, dtype=np.int64)
+        self.opcode = np.zeros(n, dtype=np.int64)
+        self.stack = np.zeros((n, STACK_DEPTH), dtype=np.int64)
+        self.sp = np.zeros(n, dtype=np.int64)
+        self.delay_timer = np.zeros(n, dtype=np.int64)
+        self.sound_timer = np.zeros(n, dtype=np.int64)
+        self.keys = np.zeros(n, dtype=np.int64)
+        # register Fx0A is waiting on, -1 when the instance isn't blocked
+        self.waiting_key = np.full(n, -1, dtype=np.int64)
+        self.display = np.zeros((n, 32), dtype=np.uint64)
+        self.draw_flag = np.zeros(n, dtype=bool)
+        self.faulted = np.zeros(n, dtype=bool)
+        self.rngs = [Random(seed) for seed in self.seeds]
+        self.frames = 0
+        return self.display
+
+    def step(self, actions=None):
+        # one frame for every instance: the keys in actions (a 16-bit mask per instance) are
+        # applied, cycles_per_frame instructions run and the timers tick once. Returns the
+        # framebuffers, the (n, 32) uint64 array the machines draw into, not a copy of it.
+        if actions is not None:
+            self.set_keys(np.asarray(actions, dtype=np.int64))
+        # like the Scheduler, an instance blocked on Fx0A at the start of the frame is parked
+        running = ~self.faulted & (self.waiting_key < 0)
+        for _ in range(self.cycles_per_frame):
+            lanes = self.lanes[running & (self.waiting_key < 0) & ~self.faulted]
+            if lanes.size == 0:
+                break
+            self.execute(lanes)
+        self.tick_timers()
+        self.frames += 1
+        info = {"faulted": self.faulted, "waiting": self.waiting_key >= 0,
+                "sound": self.sound_timer > 0, "draw": self.draw_flag}
+        return self.display, info
+
+    def set_keys(self, actions):
+        # same as calling Emulator.key_up() for every released key and then key_down() for
+        # every newly pressed key, lowest key first
+        pressed = actions & ~self.keys
+        self.keys = actions & 0xffff
+        wake = self.lanes[(self.waiting_key >= 0) & (pressed != 0)]
+        if wake.size:
+            new = pressed[wake]
+            lowest = np.log2(new & -new).astype(np.int64)
+            self.gpio[wake, self.waiting_key[wake]] = lowest
+            self.waiting_key[wake] = -1
+            self.pc[wake] += 2
+
+    def tick_timers(self):
+        self.delay_timer -= self.delay_timer > 0
+        self.sound_timer -= self.sound_timer > 0
+
+    def fault(self, lanes):
+        self.faulted[lanes] = True
+
+    def execute(self, lanes):
+        pc = self.pc[lanes]
+        outside = pc > MEMORY_SIZE - 2
+        if outside.any():
+            self.fault(lanes[outside])
+            lanes = lanes[~outside]
+            pc = pc[~outside]
+        opcode = self.memory[lanes, pc].astype(np.int64) << 8 | self.memory[lanes, pc + 1]
+        self.opcode[lanes] = opcode
+        self.pc[lanes] = pc + 2
+        family = opcode >> 12
+        for value in np.unique(family):
+            group = family == value
+            FAMILIES[value](self, lanes[group], opcode[group])
+
+    # -- the instruction families, every one gets the lanes and their opcodes --
+
+    def family_0(self, lanes, opcode):
+        clear = lanes[opcode == 0x00e0]
+        self.display[clear] = 0
+        self.draw_flag[clear] = True
+        ret = lanes[opcode == 0x00ee]
+        if ret.size:
+            empty = self.sp[ret] == 0
+            self.fault(ret[empty])
+            ret = ret[~empty]
+            self.sp[ret] -= 1
+            self.pc[ret] = self.stack[ret, self.sp[ret]]
+        # everything else is 0nnn, which is ignored
+
+    def family_1(self, lanes, opcode):
+        self.pc[lanes] = opcode & 0x0fff
+
+    def family_2(self, lanes, opcode):
+        full = self.sp[lanes] >= STACK_DEPTH
+        self.fault(lanes[full])
+        lanes = lanes[~full]
+        opcode = opcode[~full]
+        self.stack[lanes, self.sp[lanes]] = self.pc[lanes]
+        self.sp[lanes] += 1
+        self.pc[lanes] = opcode & 0x0fff
+
+    def skip_if(self, lanes, condition):
+        self.pc[lanes[condition]] += 2
+
+    def family_3(self, lanes, opcode):
+        self.skip_if(lanes, self.gpio[lanes, opcode >> 8 & 0xf] == (opcode & 0xff))
+
+    def family_4(self, lanes, opcode):
+        self.skip_if(lanes, self.gpio[lanes, opcode >> 8 & 0xf] != (opcode & 0xff))
+
+    def family_5(self, lanes, opcode):
+        lanes, opcode = self.legal(lanes, opcode, (opcode & 0xf) == 0)
+        gpio = self.gpio
+        self.skip_if(lanes, gpio[lanes, opcode >> 8 & 0xf] == gpio[lanes, opcode >> 4 & 0xf])
+
+    def family_6(self, lanes, opcode):
+        self.gpio[lanes, opcode >> 8 & 0xf] = opcode & 0xff
+
+    def family_7(self, lanes, opcode):
+        x = opcode >> 8 & 0xf
+        self.gpio[lanes, x] = (self.gpio[lanes, x] + (opcode & 0xff)) & 0xff
+
+    def family_8(self, lanes, opcode):
+        gpio = self.gpio
+        n = opcode & 0xf
+        lanes, opcode, n = self.legal(lanes, opcode, np.isin(n, (0, 1, 2, 3, 4, 5, 6, 7, 0xe)), n)
+        x = opcode >> 8 & 0xf
+        y = opcode >> 4 & 0xf
+        for op in np.unique(n):
+            group = n == op
+            l, gx, gy = lanes[group], x[group], y[group]
+            vx = gpio[l, gx].astype(np.int64)
+            vy = gpio[l, gy].astype(np.int64)
+            # VF is written before Vx just like in the scalar handlers, so when x or y is F
+            # the second half reads the new VF
+            if op == 0:
+                gpio[l, gx] = vy
+            elif op == 1:
+                gpio[l, gx] = vx | vy
+            elif op == 2:
+                gpio[l, gx] = vx & vy
+            elif op == 3:
+                gpio[l, gx] = vx ^ vy
+            elif op == 4:
+                result = vx + vy
+                gpio[l, 0xf] = result > 255
+                gpio[l, gx] = result & 0xff
+            elif op == 5:
+                gpio[l, 0xf] = vx > vy
+                gpio[l, gx] = (gpio[l, gx].astype(np.int64) - gpio[l, gy]) & 0xff
+            elif op == 6:
+                gpio[l, 0xf] = vx & 1
+                gpio[l, gx] = gpio[l, gx] >> 1
+            elif op == 7:
+                gpio[l, 0xf] = vy > vx
+                gpio[l, gx] = (gpio[l, gy].astype(np.int64) - gpio[l, gx]) & 0xff
+            else:
+                gpio[l, 0xf] = vx >> 7
+                gpio[l, gx] = (gpio[l, gx].astype(np.int64) << 1) & 0xff
+
+    def family_9(self, lanes, opcode):
+        lanes, opcode = self.legal(lanes, opcode, (opcode & 0xf) == 0)
+        gpio = self.gpio
+        self.skip_if(lanes, gpio[lanes, opcode >> 8 & 0xf] != gpio[lanes, opcode >> 4 & 0xf])
+
+    def family_A(self, lanes, opcode):
+        self.index[lanes] = opcode & 0x0fff
+
+    def family_B(self, lanes, opcode):
+        self.pc[lanes] = (opcode & 0x0fff) + self.gpio[lanes, 0]
+
+    def family_C(self, lanes, opcode):
+        # every instance has its own Random, same as Emulator, so this one stays a loop
+        rngs = self.rngs
+        gpio = self.gpio
+        for lane, op in zip(lanes.tolist(), opcode.tolist()):
+            gpio[lane, op >> 8 & 0xf] = rngs[lane].randint(0, 255) & op & 0xff
+
+    def family_D(self, lanes, opcode):
+        gpio = self.gpio
+        x = (gpio[lanes, opcode >> 8 & 0xf] & 63).astype(np.uint64)
+        y = gpio[lanes, opcode >> 4 & 0xf].astype(np.int64) & 31
+        n = opcode & 0xf
+        address = self.index[lanes]
+        collision = np.zeros(lanes.size, dtype=np.uint64)
+        for row in range(int(n.max()) if n.size else 0):
+            # sprite bytes past the end of memory are left out, like the slice in draw_sprite()
+            draws = (row < n) & (address + row < MEMORY_SIZE)
+            if not draws.any():
+                continue
+            l = lanes[draws]
+            byte = self.memory[l, address[draws] + row].astype(np.uint64)
+            shift = x[draws]
+            line = byte << np.uint64(56)
+            line = ((line >> shift) | (line << ((np.uint64(64) - shift) & np.uint64(63)))) & LINE_MASK
+            rows = (y[draws] + row) & 31
+            current = self.display[l, rows]
+            collision[draws] |= current & line
+            self.display[l, rows] = current ^ line
+        gpio[lanes, 0xf] = collision != 0
+        self.draw_flag[lanes] = True
+
+    def family_E(self, lanes, opcode):
+        kk = opcode & 0xff
+        lanes, opcode, kk = self.legal(lanes, opcode, (kk == 0x9e) | (kk == 0xa1), kk)
+        key = self.gpio[lanes, opcode >> 8 & 0xf].astype(np.int64) & 0xf
+        pressed = (self.keys[lanes] >> key & 1) == 1
+        self.skip_if(lanes, np.where(kk == 0x9e, pressed, ~pressed))
+
+    def family_F(self, lanes, opcode):
+        kk = opcode & 0xff
+        lanes, opcode, kk = self.legal(lanes, opcode, np.isin(kk, tuple(MISC)), kk)
+        x = opcode >> 8 & 0xf
+        for op in np.unique(kk):
+            group = kk == op
+            MISC[op](self, lanes[group], x[group])
+
+    def misc_07(self, lanes, x):
+        self.gpio[lanes, x] = self.delay_timer[lanes]
+
+    def misc_0A(self, lanes, x):
+        keys = self.keys[lanes]
+        held = keys != 0
+        take = lanes[held]
+        lowest = keys[held] & -keys[held]
+        self.gpio[take, x[held]] = np.log2(lowest).astype(np.int64)
+        block = lanes[~held]
+        self.waiting_key[block] = x[~held]
+        self.pc[block] -= 2
+
+    def misc_15(self, lanes, x):
+        self.delay_timer[lanes] = self.gpio[lanes, x]
+
+    def misc_18(self, lanes, x):
+        self.sound_timer[lanes] = self.gpio[lanes, x]
+
+    def misc_1E(self, lanes, x):
+        self.index[lanes] = (self.index[lanes] + self.gpio[lanes, x]) & 0xffff
+
+    def misc_29(self, lanes, x):
+        self.index[lanes] = (self.gpio[lanes, x] & 0xf).astype(np.int64) * 5
+
+    def misc_33(self, lanes, x):
+        lanes, x = self.in_memory(lanes, x, 3)
+        value = self.gpio[lanes, x]
+        address = self.index[lanes]
+        self.memory[lanes, address] = value // 100
+        self.memory[lanes, address + 1] = (value % 100) // 10
+        self.memory[lanes, address + 2] = value % 10
+
+    def misc_55(self, lanes, x):
+        lanes, x = self.in_memory(lanes, x, x + 1)
+        address = self.index[lanes]
+        for register in range(int(x.max()) + 1 if x.size else 0):
+            copy = x >= register
+            self.memory[lanes[copy], address[copy] + register] = self.gpio[lanes[copy], register]
+
+    def misc_65(self, lanes, x):
+        lanes, x = self.in_memory(lanes, x, x + 1)
+        address = self.index[lanes]
+        for register in range(int(x.max()) + 1 if x.size else 0):
+            copy = x >= register
+            self.gpio[lanes[copy], register] = self.memory[lanes[copy], address[copy] + register]
+
+    def legal(self, lanes, opcode, valid, *extra):
+        # faults the lanes whose opcode isn't an instruction, returns the rest
+        if valid.all():
+            return (lanes, opcode) + extra
+        self.fault(lanes[~valid])
+        return (lanes[valid], opcode[valid]) + tuple(array[valid] for array in extra)
+
+    def in_memory(self, lanes, x, size):
+        # faults the lanes whose copy would run past the end of memory, see check_address()
+        fits = self.index[lanes] + size <= MEMORY_SIZE
+        self.fault(lanes[~fits])
+        return lanes[fits], x[fits]
+
+    def export(self, lane):
+        # an Emulator with the state of one instance, e.g. to look at it or keep running it alone
+        emulator = Emulator(seed=self.seeds[lane])
+        emulator.memory[:] = self.memory[lane].tobytes()
+        emulator.gpio[:] = self.gpio[lane].tolist()
+        emulator.index = int(self.index[lane])
+        emulator.pc = int(self.pc[lane])
+        emulator.opcode = int(self.opcode[lane])
+        emulator.stack[:] = self.stack[lane, :self.sp[lane]].tolist()
+        emulator.delay_timer = int(self.delay_timer[lane])
+        emulator.sound_timer = int(self.sound_timer[lane])
+        emulator.keys = int(self.keys[lane])
+        emulator.waiting_key = None if self.waiting_key[lane] < 0 else int(self.waiting_key[lane])
+        emulator.display[:] = self.display[lane].tolist()
+        emulator.draw_flag = bool(self.draw_flag[lane])
+        emulator.rng.setstate(self.rngs[lane].getstate())
+        emulator.packed_rng = None
+        return emulator
+
+
+FAMILIES = [VectorMachine.family_0, VectorMachine.family_1, VectorMachine.family_2,
+            VectorMachine.family_3, VectorMachine.family_4, VectorMachine.family_5,
+            VectorMachine.family_6, VectorMachine.family_7, VectorMachine.family_8,
+            VectorMachine.family_9, VectorMachine.family_A, VectorMachine.family_B,
+            VectorMachine.family_C, VectorMachine.family_D, VectorMachine.family_E,
+            VectorMachine.family_F]
+MISC = {0x07: VectorMachine.misc_07, 0x0A: VectorMachine.misc_0A, 0x15: VectorMachine.misc_15,
+        0x18: VectorMachine.misc_18, 0x1E: VectorMachine.misc_1E, 0x29: VectorMachine.misc_29,
+        0x33: VectorMachine.misc_33, 0x55: VectorMachine.misc_55, 0x65: VectorMachine.misc_65}
@@ -0,0 +1,28 @@
+# random ROMs for the differential tests
+from chip8.emu import CHIP8, decode
+
+
+def random_rom(rng, profile=CHIP8, length=200, skip=(), keep=None, extra=(), extra_rate=0.1, annn=0.0):
+    # length random instructions for profile, with jumps and calls kept inside the ROM.
+    # Instructions named in skip never show up, keep maps a name to the chance one is kept
+    # (e.g. to make illegal opcodes rare), extra opcodes are mixed in at extra_rate since
+    # they'd hardly ever come up in random 16-bit words, and with a chance of annn Annn
+    # points I at the first 512 bytes of the ROM
+    keep = keep or {}
+    rom = bytearray()
+    while len(rom) < length * 2:
+        if extra and rng.random() < extra_rate:
+            opcode = rng.choice(extra)
+        else:
+            opcode = rng.randrange(0x10000)
+        name = decode(opcode, profile)[0].__name__
+        if name in skip:
+            continue
+        if name in keep and rng.random() >= keep[name]:
+            continue
+        if name in ("_1nnn", "_2nnn", "_Bnnn"):
+            opcode = opcode & 0xf000 | 0x200 + rng.randrange(length) * 2
+        if name == "_Annn" and annn and rng.random() < annn:
+            opcode = 0xA000 | rng.randrange(0x200, 0x400)
+        rom += opcode.to_bytes(2, "big")
+    return bytes(rom)
@@ -0,0 +1,29 @@
+# the beep starts and stops exactly on timer ticks, and everything ticked is written out by close()
+import wave
+
+from chip8.audio import Audio, SAMPLE_RATE, WavSink, render
+from chip8.emu import Emulator
+from chip8.scheduler import Scheduler, TIMER_HZ
+
+# ST = 10, then loops on the spot
+BEEP_ROM = bytes.fromhex("600A" "F018" "1204")
+FRAMES = 20
+
+
+def test_beep_follows_the_sound_timer(tmp_path):
+    path = str(tmp_path / "beep.wav")
+    emulator = Emulator()
+    emulator.load_rom_bytes(BEEP_ROM)
+    audio = Audio(WavSink(path)).attach(emulator)
+    Scheduler(emulator, throttle=False).run(FRAMES)
+    audio.close()
+    assert emulator.audio is None
+
+    samples = SAMPLE_RATE // TIMER_HZ
+    with wave.open(path, "rb") as file:
+        assert (file.getnchannels(), file.getsampwidth(), file.getframerate()) == (1, 2, SAMPLE_RATE)
+        assert file.getnframes() == FRAMES * samples
+        data = file.readframes(file.getnframes())
+    beep, silence = render()
+    ticks = [data[n * 2 * samples:(n + 1) * 2 * samples] for n in range(FRAMES)]
+    assert ticks == [beep] * 10 + [silence] * 10
@@ -0,0 +1,71 @@
+# a task reports how many instructions really ran: up to the budget, up to a fault (found again
+# from a checkpoint), or up to an Fx0A no key is ever coming for
+import pytest
+
+from chip8.batch import CHECKPOINT_FRAMES, run_batch, run_task
+
+# counts V0 through 256 values 16 times (770 instructions a round, the last one 1 short) and
+# then runs into an illegal FFFF, after 12319 instructions: at 600 Hz in the 10th instruction of
+# frame 1231, well past the first checkpoint
+COUNT_ROM = bytes.fromhex("7001" "3000" "1200" "7101" "3110" "1200" "FFFF")
+FAULT_AFTER = 12319
+# V0 = 3, waits for a key in V1, then V2 = 7 and loops
+WAIT_ROM = bytes.fromhex("6003" "F10A" "6207" "1206")
+
+
+def rom_file(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def without_time(result):
+    return dict(result, wall_time=None)
+
+
+@pytest.mark.parametrize("jit", [False, True])
+@pytest.mark.parametrize("idle", [False, True])
+def test_cycles_up_to_a_fault(tmp_path, jit, idle):
+    assert FAULT_AFTER // 10 > CHECKPOINT_FRAMES
+    rom = rom_file(tmp_path, "count.ch8", COUNT_ROM)
+    for budget, cycles, faults in ((FAULT_AFTER - 1, FAULT_AFTER - 1, False), (FAULT_AFTER, FAULT_AFTER, False),
+                                   (FAULT_AFTER + 1, FAULT_AFTER, True), (100000, FAULT_AFTER, True)):
+        result = run_task({"rom": rom, "cycles": budget, "jit": jit, "idle": idle})
+        assert result["cycles"] == cycles, budget
+        assert result["frames"] == FAULT_AFTER // 10
+        if faults:
+            assert result["error"] == "illegal instruction FFFF at 20C"
+        else:
+            assert result["error"] is None
+        # all of them stop within the last few instructions before the FFFF
+        assert result["v"][:2] == [0, 16]
+
+
+def test_missing_rom(tmp_path):
+    result = run_task({"rom": str(tmp_path / "missing.ch8"), "seed": 3})
+    assert result["cycles"] == 0
+    assert result["frames"] == 0
+    assert result["pc"] is None
+    assert "No such file" in result["error"]
+
+
+def test_waiting_for_a_key(tmp_path):
+    rom = rom_file(tmp_path, "wait.ch8", WAIT_ROM)
+    # nothing is ever pressed: the task ends in the frame the CPU parked in
+    result = run_task({"rom": rom, "cycles": 1000})
+    assert (result["cycles"], result["frames"], result["error"]) == (10, 1, None)
+    assert result["v"][:3] == [3, 0, 0]
+    assert result["pc"] == 0x202
+    # a key before frame 30: the 29 frames in between are parked and don't count
+    result = run_task({"rom": rom, "cycles": 1000, "inputs": [[30, 0xB, True]]})
+    assert (result["cycles"], result["frames"], result["error"]) == (1000, 1 + 29 + 99, None)
+    assert result["v"][:3] == [3, 0xB, 7]
+
+
+def test_run_batch(tmp_path):
+    tasks = [{"rom": rom_file(tmp_path, "count.ch8", COUNT_ROM), "cycles": 20000, "seed": 1},
+             {"rom": str(tmp_path / "missing.ch8")},
+             {"rom": rom_file(tmp_path, "wait.ch8", WAIT_ROM), "cycles": 500, "inputs": [[5, 2, True]]},
+             {"rom": rom_file(tmp_path, "count.ch8", COUNT_ROM), "cycles": 123, "jit": True}]
+    results = list(run_batch(tasks, workers=2, chunksize=1))
+    assert [without_time(result) for result in results] == [without_time(run_task(task)) for task in tasks]
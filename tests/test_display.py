@@ -0,0 +1,38 @@
+# sprites drawn over the right and bottom edges wrap around to the other side, pixel for pixel
+from chip8.emu import Emulator
+
+# the rows of the "0" sprite wrapped from x = 62: pixels 62, 63, 0 and 1 for 0xF0, 62 and 1 for 0x90
+WRAPPED_F0 = 0b11 | 0b11 << 62
+WRAPPED_90 = 0b10 | 0b01 << 62
+
+
+def draw_zero(emulator):
+    # the font's "0" at (62, 31)
+    for opcode in (0x603E, 0x611F, 0x6200, 0xF229, 0xD015):
+        emulator.memory[emulator.pc:emulator.pc + 2] = opcode.to_bytes(2, "big")
+        emulator.step()
+
+
+def test_sprite_wraps_around_both_edges():
+    emulator = Emulator()
+    draw_zero(emulator)
+    expected = [0] * 32
+    expected[31] = expected[3] = WRAPPED_F0
+    expected[0] = expected[1] = expected[2] = WRAPPED_90
+    assert emulator.display == expected
+    assert emulator.gpio[0xf] == 0
+    assert emulator.draw_flag
+
+
+def test_collision_on_the_wrapped_pixels():
+    emulator = Emulator()
+    # only pixel 0 of row 0 is lit, the wrapped sprite doesn't touch it
+    emulator.display[0] = 1 << 63
+    draw_zero(emulator)
+    assert emulator.gpio[0xf] == 0
+    # pixel 1 of row 0 is one the sprite wraps onto, drawing the sprite erases it
+    emulator = Emulator()
+    emulator.display[0] = 1 << 62
+    draw_zero(emulator)
+    assert emulator.gpio[0xf] == 1
+    assert emulator.display[0] == 0b10
@@ -0,0 +1,74 @@
+# differential test: skipping wait loops has to end up in exactly the same state as running
+# every instruction, frame by frame and whatever the speed
+import random
+
+import pytest
+
+from chip8.emu import Emulator, IllegalInstruction
+from chip8.scheduler import Scheduler
+from romgen import random_rom
+
+FRAMES = 60
+
+
+def wait_loops(rng, rom, count=6):
+    # writes wait loops over random places of a random ROM: on the delay timer (with the timer
+    # set right before it), on a key being up or down, and counting a register up, which never
+    # repeats and must not be skipped
+    rom = bytearray(rom)
+    for _ in range(count):
+        at = rng.randrange(0, len(rom) - 10, 2)
+        start = 0x200 + at
+        x = rng.randrange(16)
+        kind = rng.randrange(4)
+        if kind == 0:
+            opcodes = [0x6000 | x << 8 | rng.randrange(1, 20), 0xF015 | x << 8,
+                       0xF007 | x << 8, 0x3000 | x << 8, 0x1000 | start + 4]
+        elif kind == 1:
+            opcodes = [0xE09E | x << 8, 0x1000 | start]
+        elif kind == 2:
+            opcodes = [0xE0A1 | x << 8, 0x1000 | start]
+        else:
+            opcodes = [0x7001 | x << 8, 0x3000 | x << 8 | rng.randrange(256), 0x1000 | start]
+        for number, opcode in enumerate(opcodes):
+            rom[at + number * 2:at + number * 2 + 2] = opcode.to_bytes(2, "big")
+    return bytes(rom)
+
+
+def run(rom, seed, cpu_hz, actions, idle):
+    emulator = Emulator(seed=seed, idle=idle)
+    emulator.load_rom_bytes(rom)
+    scheduler = Scheduler(emulator, cpu_hz=cpu_hz, throttle=False)
+    states = []
+    try:
+        for mask in actions:
+            for key in range(16):
+                if mask >> key & 1:
+                    emulator.key_down(key)
+                else:
+                    emulator.key_up(key)
+            scheduler.frame()
+            states.append(emulator.save_state())
+    except (IllegalInstruction, IndexError) as e:
+        states.append(str(e))
+    return states, emulator
+
+
+@pytest.mark.parametrize("cpu_hz", [600, 1000, 3000, 12000])
+def test_idle_matches_interpreter(cpu_hz):
+    skipped = 0
+    for seed in range(40):
+        rng = random.Random(seed)
+        rom = wait_loops(rng, random_rom(rng, length=120, skip=("_illegal", "_2nnn"), annn=0.9))
+        # the same keys stay down for a while, like someone playing
+        actions = []
+        mask = 0
+        for _ in range(FRAMES):
+            if rng.random() < 0.2:
+                mask = rng.choice([0, 1 << rng.randrange(16), rng.randrange(0x10000)])
+            actions.append(mask)
+        states, emulator = run(rom, seed, cpu_hz, actions, True)
+        assert states == run(rom, seed, cpu_hz, actions, False)[0], seed
+        skipped += emulator.idle.skipped
+    # the loops really were skipped
+    assert skipped
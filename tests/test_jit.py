@@ -0,0 +1,49 @@
+# differential test: random ROMs run through the translation cache have to end up in exactly
+# the same state as through the interpreter, faults included
+import random
+
+import pytest
+
+from chip8.emu import Emulator, IllegalInstruction, PROFILES
+from romgen import random_rom
+
+# SCHIP and quirk opcodes, mixed in since they'd hardly ever come up in random 16-bit words
+EXTRA_OPCODES = [0x00FB, 0x00FC, 0x00FE, 0x00FF, 0x00C3, 0xF330, 0xF775, 0xF385, 0xD120,
+                 0x8126, 0x834E, 0xF355, 0xF265]
+
+
+def machine_state(emulator):
+    return (emulator.pc, emulator.opcode, list(emulator.gpio), emulator.index, list(emulator.stack),
+            list(emulator.display), bytes(emulator.memory), emulator.delay_timer, list(emulator.flags))
+
+
+def run(rom, seed, chunks, jit, profile):
+    emulator = Emulator(jit=jit, seed=seed, profile=profile)
+    emulator.load_rom_bytes(rom)
+    error = None
+    try:
+        for chunk in chunks:
+            emulator.run(chunk)
+            emulator.tick_timers()
+    except (IllegalInstruction, IndexError) as e:
+        error = str(e)
+    return machine_state(emulator), error
+
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_jit_matches_interpreter(profile):
+    for seed in range(60):
+        rng = random.Random(seed)
+        # nothing that waits for a key
+        rom = random_rom(rng, PROFILES[profile], skip=("_illegal", "_Fx0A", "_00EE", "_00FD"),
+                         extra=EXTRA_OPCODES)
+        chunks = [rng.randrange(1, 50) for _ in range(40)]
+        assert run(rom, seed, chunks, True, profile) == run(rom, seed, chunks, False, profile), seed
+
+
+def test_fault_inside_block():
+    # Fx65 reading past the end of memory in the middle of a block stops on the Fx65, like the interpreter
+    rom = b"".join(opcode.to_bytes(2, "big") for opcode in (0x6001, 0xAFFF, 0x6102, 0xF165, 0x6003, 0x1200))
+    interpreted = run(rom, 0, [10], False, "chip8")
+    assert interpreted[0][:2] == (0x208, 0xF165)
+    assert run(rom, 0, [10], True, "chip8") == interpreted
@@ -0,0 +1,63 @@
+# Fx0A parks the CPU until a key goes down instead of spinning on the instruction
+from chip8.emu import Emulator
+from chip8.scheduler import Scheduler
+
+# V3 = key, then V4 = 7
+WAIT_ROM = bytes.fromhex("F30A" "6407" "1204")
+
+
+def waiting():
+    emulator = Emulator()
+    emulator.load_rom_bytes(WAIT_ROM)
+    emulator.step()
+    return emulator
+
+
+def test_parks_without_a_key():
+    emulator = waiting()
+    assert emulator.waiting_key == 3
+    assert emulator.pc == 0x200
+    # running doesn't get past it either
+    emulator.run(10)
+    assert emulator.pc == 0x200
+    assert emulator.gpio[4] == 0
+
+
+def test_key_down_wakes_it():
+    emulator = waiting()
+    emulator.key_down(0xB)
+    assert emulator.waiting_key is None
+    assert emulator.gpio[3] == 0xB
+    assert emulator.pc == 0x202
+    emulator.step()
+    assert emulator.gpio[4] == 7
+    # releasing the key doesn't undo anything
+    emulator.key_up(0xB)
+    assert emulator.gpio[3] == 0xB
+
+
+def test_held_key_is_taken_straight_away():
+    emulator = Emulator()
+    emulator.load_rom_bytes(WAIT_ROM)
+    emulator.key_down(0x9)
+    emulator.key_down(0x2)
+    emulator.step()
+    # the lowest key that's down
+    assert emulator.gpio[3] == 0x2
+    assert emulator.waiting_key is None
+    assert emulator.pc == 0x202
+
+
+def test_timers_run_while_parked():
+    emulator = waiting()
+    emulator.delay_timer = emulator.sound_timer = 5
+    scheduler = Scheduler(emulator, throttle=False)
+    for _ in range(3):
+        scheduler.frame()
+    assert (emulator.delay_timer, emulator.sound_timer) == (2, 2)
+    assert scheduler.frames == 3
+    assert emulator.pc == 0x200
+    emulator.key_down(0)
+    scheduler.frame()
+    assert emulator.gpio[4] == 7
+    assert emulator.delay_timer == 1
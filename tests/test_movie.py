@@ -0,0 +1,68 @@
+# a recorded movie has to seek() to exactly the state the live session was in at that frame,
+# whatever speed it was recorded at
+import random
+
+import pytest
+
+from chip8.emu import Emulator, IllegalInstruction
+from chip8.movie import MovieRecorder, MoviePlayer
+from chip8.scheduler import Scheduler
+from romgen import random_rom
+
+FRAMES = 100
+
+
+def record(rom_path, movie_path, seed, cpu_hz, rng):
+    # plays FRAMES frames with random keys, returns the state right before every frame ran
+    emulator = Emulator(rom_path, seed=seed)
+    scheduler = Scheduler(emulator, cpu_hz=cpu_hz, throttle=False)
+    recorder = MovieRecorder(movie_path, emulator, rom_path, seed, checkpoint_interval=25).attach(scheduler)
+    states = []
+    try:
+        for frame in range(FRAMES):
+            states.append(emulator.save_state())
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                key = rng.randrange(16)
+                if rng.random() < 0.5:
+                    recorder.key_down(key)
+                else:
+                    recorder.key_up(key)
+            scheduler.frame()
+    except (IllegalInstruction, IndexError):
+        # the frame that faulted can't be played back to its end
+        pass
+    recorder.close()
+    return states
+
+
+# 120000 Hz is more than the 16 bits movies used to store it in, and slow, so fewer seeds
+@pytest.mark.parametrize("cpu_hz, seeds", [(600, 8), (1200, 8), (250, 8), (120000, 2)])
+def test_seek_matches_recording(tmp_path, cpu_hz, seeds):
+    rom_path = str(tmp_path / "rom.ch8")
+    movie_path = str(tmp_path / "run.c8m")
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        # key checks and Fx0A waits are what the keys in the movie are there for, calls and I
+        # pointing anywhere are left out so most ROMs get through all of the frames
+        rom = random_rom(rng, skip=("_illegal", "_00EE", "_2nnn"), extra=[0xE09E, 0xE1A1, 0xF20A, 0xF307, 0xC3FF],
+                         annn=0.9)
+        with open(rom_path, "wb") as file:
+            file.write(rom)
+        states = record(rom_path, movie_path, seed, cpu_hz, rng)
+        player = MoviePlayer(movie_path, rom_path)
+        frames = list(range(len(states)))
+        rng.shuffle(frames)
+        for frame in frames:
+            player.seek(frame)
+            assert player.emulator.save_state() == states[frame], (seed, frame)
+
+
+def test_seed_has_to_fit(tmp_path):
+    rom_path = str(tmp_path / "rom.ch8")
+    movie_path = tmp_path / "run.c8m"
+    with open(rom_path, "wb") as file:
+        file.write(b"\x12\x00")
+    with pytest.raises(ValueError):
+        MovieRecorder(str(movie_path), Emulator(rom_path), rom_path, seed=1 << 64)
+    # nothing is written before the recorder is attached
+    assert not movie_path.exists()
@@ -0,0 +1,68 @@
+# rewinding has to put the emulator back into exactly the state it was in at that frame, however
+# far back it goes, whatever was rewound before and after old keyframes were thrown away
+import random
+
+import pytest
+
+from chip8.emu import Emulator, IllegalInstruction
+from chip8.rewind import RewindBuffer
+from chip8.scheduler import Scheduler
+from romgen import random_rom
+
+FRAMES = 300
+
+
+def session(rom_path, seed, budget_mb, keyframe_interval, rng):
+    # plays FRAMES frames with random keys and rewinds by a random number of frames every now
+    # and then, checking every rewind against the states saved while playing
+    emulator = Emulator(rom_path, seed=seed)
+    scheduler = Scheduler(emulator, throttle=False)
+    rewind = RewindBuffer(emulator, budget_mb=budget_mb, keyframe_interval=keyframe_interval).attach(scheduler)
+    # states[n] is the emulator right after recorded frame n
+    states = [emulator.save_state()]
+    rewound = 0
+    try:
+        for _ in range(FRAMES):
+            if rng.random() < 0.1:
+                frames = rewind.rewind(rng.randrange(1, 3 * keyframe_interval))
+                assert rewind.frame == len(states) - 1 - frames
+                del states[rewind.frame + 1:]
+                assert emulator.save_state() == states[-1], (seed, rewind.frame)
+                rewound += frames
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                key = rng.randrange(16)
+                if rng.random() < 0.5:
+                    rewind.key_down(key)
+                else:
+                    rewind.key_up(key)
+            scheduler.frame()
+            states.append(emulator.save_state())
+    except (IllegalInstruction, IndexError):
+        pass
+    # everything still in the buffer, newest first, then back past what's left
+    while rewind.rewind(rng.randrange(1, keyframe_interval)):
+        del states[rewind.frame + 1:]
+        assert emulator.save_state() == states[-1], (seed, rewind.frame)
+    assert rewind.size() <= max(rewind.max_bytes, len(states[-1]))
+    # keys from before the oldest keyframe can't be replayed anymore and aren't kept
+    assert all(frame >= rewind.keyframe_frames[0] for frame in rewind.events)
+    return rewound, len(states) - 1
+
+
+@pytest.mark.parametrize("budget_mb, keyframe_interval", [(16, 120), (0.05, 10), (0.02, 7)])
+def test_rewind_matches_recording(tmp_path, budget_mb, keyframe_interval):
+    rom_path = str(tmp_path / "rom.ch8")
+    rewound = evicted = 0
+    for seed in range(8):
+        rng = random.Random(seed)
+        rom = random_rom(rng, skip=("_illegal", "_00EE", "_2nnn"), extra=[0xE09E, 0xE1A1, 0xF20A, 0xF307, 0xC3FF],
+                         annn=0.9)
+        with open(rom_path, "wb") as file:
+            file.write(rom)
+        frames, first = session(rom_path, seed, budget_mb, keyframe_interval, rng)
+        rewound += frames
+        # the last rewinds stopped at the oldest frame that was still kept
+        evicted += first > 0
+    assert rewound
+    if budget_mb < 1:
+        assert evicted
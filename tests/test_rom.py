@@ -0,0 +1,43 @@
+# ROMs fill memory from 0x200 up to 0xFFF at most, anything bigger is refused before memory is touched
+import pytest
+
+from chip8.emu import MAX_ROM_SIZE, MEMORY_SIZE, PROGRAM_START, Emulator, RomError
+
+
+def rom_bytes(size):
+    return bytes(n * 7 & 0xff for n in range(size))
+
+
+def test_largest_rom_fills_memory(tmp_path):
+    assert MAX_ROM_SIZE == 3584
+    path = tmp_path / "big.ch8"
+    path.write_bytes(rom_bytes(MAX_ROM_SIZE))
+    emulator = Emulator(str(path))
+    assert emulator.memory[PROGRAM_START:] == rom_bytes(MAX_ROM_SIZE)
+    assert len(emulator.memory) == MEMORY_SIZE
+    other = Emulator()
+    other.load_rom_bytes(memoryview(rom_bytes(MAX_ROM_SIZE)))
+    assert other.memory == emulator.memory
+
+
+def test_too_big_rom(tmp_path):
+    path = tmp_path / "huge.ch8"
+    path.write_bytes(rom_bytes(MAX_ROM_SIZE + 1))
+    with pytest.raises(RomError, match="3585 bytes"):
+        Emulator(str(path))
+    emulator = Emulator()
+    before = bytes(emulator.memory)
+    with pytest.raises(RomError):
+        emulator.load_rom(str(path))
+    with pytest.raises(RomError):
+        emulator.load_rom_bytes(rom_bytes(MAX_ROM_SIZE + 1))
+    assert emulator.memory == before
+
+
+def test_empty_rom(tmp_path):
+    # an empty file can't be mapped, it loads as nothing
+    path = tmp_path / "empty.ch8"
+    path.write_bytes(b"")
+    emulator = Emulator(str(path))
+    assert emulator.memory == Emulator().memory
+    assert emulator.pc == PROGRAM_START
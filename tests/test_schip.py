@@ -0,0 +1,116 @@
+# what the SUPER-CHIP and COSMAC VIP instructions do to the framebuffer, registers and memory.
+# The differential tests only check that every way of running them agrees, these check the answer.
+import pytest
+
+from chip8.emu import BIG_FONT_START, Emulator
+
+HIRES_MASK = (1 << 128) - 1
+
+
+def execute(emulator, *opcodes):
+    # runs the opcodes from wherever the PC is
+    for opcode in opcodes:
+        emulator.memory[emulator.pc:emulator.pc + 2] = opcode.to_bytes(2, "big")
+        emulator.step()
+
+
+def hires():
+    emulator = Emulator(profile="schip")
+    execute(emulator, 0x00FF)
+    return emulator
+
+
+def test_resolution_switch():
+    emulator = Emulator(profile="schip")
+    emulator.display[3] = 1
+    execute(emulator, 0x00FF)
+    assert (emulator.width, emulator.height) == (128, 64)
+    assert emulator.display == [0] * 64
+    assert emulator.draw_flag
+    # switching to the mode it's already in keeps the screen
+    emulator.display[63] = 1 << 127
+    execute(emulator, 0x00FF)
+    assert emulator.display[63] == 1 << 127
+    execute(emulator, 0x00FE)
+    assert (emulator.width, emulator.height) == (64, 32)
+    assert emulator.display == [0] * 32
+    # x = 70 is x = 6 on the 64 pixel wide screen, the 128 pixel wide one has room for it
+    execute(emulator, 0x6046, 0x6100, 0xA000, 0xD011)
+    assert emulator.display[0] == 0xf0 << 64 - 8 - 6
+    execute(emulator, 0x00FF, 0xD011)
+    assert emulator.display[0] == 0xf0 << 128 - 8 - 70
+
+
+@pytest.mark.parametrize("n", [1, 3, 15])
+def test_scroll_down(n):
+    emulator = hires()
+    rows = [(row + 1) * 0x1234567 for row in range(64)]
+    emulator.display[:] = rows
+    emulator.draw_flag = False
+    execute(emulator, 0x00C0 | n)
+    assert emulator.display == [0] * n + rows[:64 - n]
+    assert emulator.draw_flag
+
+
+def test_scroll_right_and_left():
+    emulator = hires()
+    # the leftmost and the rightmost pixel of the first row, a 4 pixel run in the middle of the second
+    emulator.display[0] = 1 << 127 | 1
+    emulator.display[1] = 0xf << 62
+    execute(emulator, 0x00FB)
+    assert emulator.display[0] == 1 << 123
+    assert emulator.display[1] == 0xf << 58
+    execute(emulator, 0x00FC, 0x00FC)
+    # the pixel scrolled off the right edge is gone, and so is the one pushed off the left
+    assert emulator.display[0] == 0
+    assert emulator.display[1] == 0xf << 66
+    assert all(row & ~HIRES_MASK == 0 for row in emulator.display)
+
+
+def test_big_sprite_clipped_at_the_edges():
+    emulator = hires()
+    emulator.memory[0x300:0x320] = b"\xff" * 32
+    # 8 of the 16 columns and 8 of the 16 rows are on the screen
+    execute(emulator, 0x6078, 0x6138, 0xA300, 0xD010)
+    for row in range(64):
+        assert emulator.display[row] == (0xff if row >= 56 else 0), row
+    assert emulator.gpio[0xf] == 0
+    # drawn over itself it erases, every pixel collides
+    execute(emulator, 0xD010)
+    assert emulator.display == [0] * 64
+    assert emulator.gpio[0xf] == 1
+
+
+def test_big_font_and_flag_registers():
+    emulator = Emulator(profile="schip")
+    execute(emulator, 0x6307, 0xF330)
+    assert emulator.index == BIG_FONT_START + 70
+    assert list(emulator.memory[emulator.index:emulator.index + 10]) == emulator.big_fonts[70:80]
+    emulator.gpio[:8] = range(10, 18)
+    execute(emulator, 0xF575)
+    assert emulator.flags == [10, 11, 12, 13, 14, 15, 0, 0]
+    emulator.gpio[:8] = [0] * 8
+    execute(emulator, 0xF385)
+    assert emulator.gpio[:8] == [10, 11, 12, 13, 0, 0, 0, 0]
+
+
+@pytest.mark.parametrize("profile, expected", [("vip", (0x02, 1, 0x05)), ("chip8", (0x01, 1, 0x05))])
+def test_shift_quirk(profile, expected):
+    emulator = Emulator(profile=profile)
+    execute(emulator, 0x6003, 0x6105, 0x8016)
+    assert (emulator.gpio[0], emulator.gpio[0xf], emulator.gpio[1]) == expected
+    execute(emulator, 0x6081, 0x61C1, 0x801E)
+    # vip: Vy 0xC1 shifted left, chip8: V0 0x81 shifted left
+    assert (emulator.gpio[0], emulator.gpio[0xf]) == ((0x82, 1) if profile == "vip" else (0x02, 1))
+    assert emulator.gpio[1] == 0xC1
+
+
+@pytest.mark.parametrize("profile, moves", [("vip", True), ("chip8", False), ("schip", False)])
+def test_load_store_quirk(profile, moves):
+    emulator = Emulator(profile=profile)
+    execute(emulator, 0x6011, 0x6122, 0x6233, 0xA300, 0xF255)
+    assert emulator.memory[0x300:0x304] == b"\x11\x22\x33\x00"
+    assert emulator.index == (0x303 if moves else 0x300)
+    execute(emulator, 0xA300, 0x6000, 0x6100, 0xF165)
+    assert emulator.gpio[:3] == [0x11, 0x22, 0x33]
+    assert emulator.index == (0x302 if moves else 0x300)
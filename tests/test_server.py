@@ -0,0 +1,109 @@
+# the frame deltas have to rebuild exactly the framebuffer they were made from, and a viewer
+# connected to a FrameServer has to see the frames of the session it joined and drive it with keys
+import asyncio
+import random
+import threading
+import time
+
+import pytest
+
+from chip8.emu import Emulator
+from chip8.server import FrameClient, FrameServer, Session, apply_delta, encode_delta
+
+# waits for a key and draws its digit in the top left corner, over and over while it's held
+KEY_ROM = bytes.fromhex("F00A" "00E0" "F029" "6100" "D115" "1200")
+
+
+def random_display(rng, rows):
+    width = 128 if rows == 64 else 64
+    kind = rng.randrange(3)
+    if kind == 0:
+        # a few pixels, far apart
+        return [rng.getrandbits(width) if rng.random() < 0.05 else 0 for _ in range(rows)]
+    if kind == 1:
+        # everything lit, so the runs are longer than 255 bytes
+        return [(1 << width) - 1 - rng.getrandbits(width) % 2 for _ in range(rows)]
+    return [rng.getrandbits(width) for _ in range(rows)]
+
+
+def test_delta_round_trip():
+    rng = random.Random(0)
+    display = [0] * 32
+    for step in range(400):
+        rows = rng.choice([32, 64]) if step % 10 == 0 else len(display)
+        new = random_display(rng, rows)
+        delta = encode_delta(display, new)
+        assert apply_delta(display, delta, rows) == new, step
+        display = new
+
+
+def test_delta_long_gaps_and_runs():
+    # a single pixel in the last row of hi-res is more than 255 unchanged bytes in, a full
+    # screen is more than 255 changed ones in a row
+    for rows, width in ((32, 64), (64, 128)):
+        blank = [0] * rows
+        corner = [0] * (rows - 1) + [1]
+        full = [(1 << width) - 1] * rows
+        for old, new in ((blank, corner), (corner, full), (full, blank), (blank, blank)):
+            assert apply_delta(old, encode_delta(old, new), rows) == new
+    assert encode_delta([0] * 32, [0] * 32) == b""
+
+
+def expected_display(key):
+    emulator = Emulator()
+    emulator.load_rom_bytes(KEY_ROM)
+    emulator.key_down(key)
+    emulator.run(5)
+    return list(emulator.display)
+
+
+async def next_frame(frames):
+    return await asyncio.wait_for(frames.__anext__(), 5)
+
+
+async def talk(path):
+    emulator = Emulator()
+    emulator.load_rom_bytes(KEY_ROM)
+    server = FrameServer([Session("keys", emulator)])
+    await server.start(path=path)
+    try:
+        client = await FrameClient.connect("keys", path=path)
+        frames = client.frames()
+        # what the session shows when the viewer joins, nothing has been drawn yet
+        frame, display = await next_frame(frames)
+        assert display == [0] * 32
+        await client.key(5, True)
+        while display == [0] * 32:
+            frame, display = await next_frame(frames)
+        assert frame > 0
+        assert display == expected_display(5)
+        await client.close()
+
+        client = await FrameClient.connect("nope", path=path)
+        with pytest.raises(ConnectionError, match="no such session"):
+            await next_frame(client.frames())
+        await client.close()
+    finally:
+        server.close()
+
+
+def test_server_join_frames_keys(tmp_path):
+    asyncio.run(talk(str(tmp_path / "chip8.sock")))
+
+
+def test_sessions_outliving_the_loop(tmp_path, monkeypatch):
+    # a session still publishing after its event loop was closed drops the frames quietly
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    emulator = Emulator()
+    # clears the screen over and over, so every frame is published
+    emulator.load_rom_bytes(bytes.fromhex("00E0" "1200"))
+    server = FrameServer([Session("clear", emulator)])
+
+    async def start():
+        await server.start(path=str(tmp_path / "chip8.sock"))
+
+    asyncio.run(start())
+    time.sleep(0.1)
+    server.close()
+    assert errors == []
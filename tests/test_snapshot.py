@@ -0,0 +1,84 @@
+# a SnapshotHistory has to give back exactly the states that went into it, including states of
+# different sizes (lo-res and hi-res), after truncating and after the oldest ones were dropped
+import random
+
+import pytest
+
+from chip8.emu import Emulator, IllegalInstruction
+from chip8.snapshot import SnapshotHistory
+from romgen import random_rom
+
+
+def states(seed, count=200):
+    # save_state() after every few instructions of a random SCHIP ROM, switched between lo-res and
+    # hi-res every 30 states on top of what the ROM does
+    rng = random.Random(seed)
+    emulator = Emulator(seed=seed, profile="schip")
+    rom = random_rom(rng, emulator.profile, skip=("_illegal", "_Fx0A", "_00EE", "_2nnn", "_Bnnn", "_00FD"),
+                     extra=[0x00FE, 0x00FF, 0xD120, 0xC3FF], extra_rate=0.3, annn=0.9)
+    emulator.load_rom_bytes(rom)
+    result = []
+    try:
+        for number in range(count):
+            if number % 30 == 0:
+                emulator.set_resolution(number % 60 == 30)
+            emulator.run(rng.randrange(1, 10))
+            result.append(emulator.save_state())
+    except (IllegalInstruction, IndexError):
+        pass
+    return result
+
+
+def test_states_come_back():
+    for seed in range(5):
+        saved = states(seed)
+        assert len(set(map(len, saved))) > 1, seed
+        history = SnapshotHistory(keyframe_interval=16)
+        for state in saved:
+            history.append(state)
+        assert len(history) == len(saved)
+        for number in random.Random(seed).sample(range(len(saved)), len(saved)):
+            assert history[number] == saved[number], (seed, number)
+        assert history[-1] == saved[-1]
+        with pytest.raises(IndexError):
+            history[len(saved)]
+
+
+def test_truncate():
+    saved = states(1)
+    other = states(2)
+    history = SnapshotHistory(keyframe_interval=10)
+    for state in saved:
+        history.append(state)
+    for length in (len(saved) - 1, 75, 70, 31, 0):
+        history.truncate(length)
+        assert len(history) == length
+        assert [history[number] for number in range(length)] == saved[:length]
+    # a different future recorded after going back
+    history.truncate(0)
+    for state in saved[:25]:
+        history.append(state)
+    history.truncate(13)
+    for state in other:
+        history.append(state)
+    assert [history[number] for number in range(len(history))] == saved[:13] + other
+
+
+def test_oldest_dropped_over_max_bytes():
+    saved = states(3)
+    max_bytes = 4 * len(max(saved, key=len))
+    history = SnapshotHistory(keyframe_interval=8, max_bytes=max_bytes)
+    for state in saved:
+        history.append(state)
+        assert history.size <= max_bytes or len(history.groups) == 1
+    assert history.dropped > 0
+    assert len(history) == len(saved)
+    with pytest.raises(IndexError):
+        history[history.dropped - 1]
+    for number in range(history.dropped, len(saved)):
+        assert history[number] == saved[number], number
+    # truncating back into what's still kept, then past it
+    history.truncate(len(saved) - 5)
+    assert history[len(saved) - 6] == saved[-6]
+    history.truncate(history.dropped - 1)
+    assert history.groups == [] and history.last is None
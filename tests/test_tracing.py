@@ -0,0 +1,45 @@
+# a trace has to give back every executed instruction with the registers as they were before it
+import json
+
+import pytest
+
+from chip8.emu import Emulator
+from chip8.tracing import RECORD, BinaryTrace, JsonTrace, read_trace
+
+# counts V0 up, adds it to I, and fills V1 with random numbers
+ROM = bytes.fromhex("7001" "F01E" "C1FF" "1200")
+STEPS = 300
+
+
+def traced(hook):
+    # runs the ROM with hook as the trace, returns what the emulator looked like before every instruction
+    expected = []
+
+    def both(emulator, pc, opcode):
+        expected.append((pc, opcode, emulator.index, list(emulator.gpio)))
+        hook(emulator, pc, opcode)
+
+    emulator = Emulator(seed=1)
+    emulator.load_rom_bytes(ROM)
+    emulator.trace = both
+    emulator.run(STEPS)
+    hook.close()
+    return expected
+
+
+@pytest.mark.parametrize("buffer_size", [RECORD.size * 7, 1 << 16])
+def test_binary_trace(tmp_path, buffer_size):
+    # with the small buffer the records go out in chunks, the rest is flushed by close()
+    path = str(tmp_path / "run.trace")
+    trace = BinaryTrace(path, buffer_size=buffer_size)
+    expected = traced(trace)
+    assert len(expected) == STEPS
+    assert list(read_trace(path)) == expected
+
+
+def test_json_trace(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    expected = traced(JsonTrace(path, buffer_size=64))
+    with open(path) as file:
+        records = [json.loads(line) for line in file]
+    assert [(record["pc"], record["opcode"], record["i"], record["v"]) for record in records] == expected
@@ -0,0 +1,53 @@
+# differential test: every instance of a VectorMachine has to end up exactly where an Emulator
+# with the same seed and the same keys does, faults included
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from chip8.emu import Emulator, IllegalInstruction
+from chip8.scheduler import Scheduler
+from chip8.vector import VectorMachine
+from romgen import random_rom
+
+LANES = 24
+FRAMES = 40
+
+
+def run_scalar(rom, seed, actions):
+    # the same frames as VectorMachine.step(), with the key mask of every frame
+    emulator = Emulator(seed=seed)
+    emulator.load_rom_bytes(rom)
+    scheduler = Scheduler(emulator, throttle=False)
+    try:
+        for mask in actions:
+            for key in range(16):
+                if emulator.keys >> key & 1 and not mask >> key & 1:
+                    emulator.key_up(key)
+            for key in range(16):
+                if mask >> key & 1 and not emulator.keys >> key & 1:
+                    emulator.key_down(key)
+            scheduler.frame()
+    except (IllegalInstruction, IndexError):
+        return None
+    return emulator
+
+
+@pytest.mark.parametrize("block", range(4))
+def test_vector_matches_emulator(block):
+    for rom_seed in range(block * 15, block * 15 + 15):
+        rng = random.Random(rom_seed)
+        # mostly legal instructions and I mostly pointing at the ROM
+        rom = random_rom(rng, length=150, keep={"_illegal": 0.03, "_00EE": 0.5}, annn=0.7)
+        seeds = [rom_seed * 100 + lane for lane in range(LANES)]
+        actions = [[rng.choice([0, 0, 1 << rng.randrange(16), rng.randrange(0x10000)]) for _ in range(LANES)]
+                   for _ in range(FRAMES)]
+        machine = VectorMachine(LANES, rom, seeds=seeds)
+        for frame in range(FRAMES):
+            machine.step(np.array(actions[frame]))
+        for lane in range(LANES):
+            emulator = run_scalar(rom, seeds[lane], [frame[lane] for frame in actions])
+            assert (emulator is None) == bool(machine.faulted[lane]), (rom_seed, lane)
+            if emulator is not None:
+                assert machine.export(lane).save_state() == emulator.save_state(), (rom_seed, lane)